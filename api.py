@@ -0,0 +1,242 @@
+import os
+import gzip
+import json
+import hashlib
+import pandas as pd
+from flask import Blueprint, Response, request
+from data_store import dataset_version
+from dashboard import get_dashboard_snapshot
+from wine_catalog import get_wine_catalog
+from auction_analytics import DEMAND_DIMENSIONS, get_auction_analytics, to_records
+from pagination import get_page_args, get_pagination, get_wine_filters
+from wine_matching import DEFAULT_MATCHES, MAX_MATCHES, match_city
+from route_matrix import MATRIX_COLUMNS, restaurant_delivery_etas
+import logistics_refresher
+import restaurant_cache
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+API_VERSION = "v1"
+# Responses smaller than this are sent uncompressed
+API_COMPRESS_MIN_BYTES = int(os.getenv('API_COMPRESS_MIN_BYTES', 1024))
+API_GZIP_LEVEL = int(os.getenv('API_GZIP_LEVEL', 6))
+API_BROTLI_QUALITY = int(os.getenv('API_BROTLI_QUALITY', 5))
+
+api = Blueprint("api", __name__, url_prefix=f"/api/{API_VERSION}")
+
+
+def _default(value):
+    # Missing values of nullable (Int64, Int8, ...) and datetime columns
+    if value is pd.NA or value is pd.NaT:
+        return None
+    # numpy scalars and pandas timestamps that the encoders don't know about
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(data):
+    """Serialize to JSON bytes, with orjson when it is installed. NaN becomes null."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(_without_nan(data), default=_default, separators=(",", ":")).encode()
+
+
+def _without_nan(data):
+    if isinstance(data, float) and data != data:
+        return None
+    if isinstance(data, dict):
+        return {key: _without_nan(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_without_nan(value) for value in data]
+    return data
+
+
+def make_etag(*parts):
+    """Weak ETag over the API version, the request's query string and the given version parts."""
+    digest = hashlib.sha1(API_VERSION.encode())
+    digest.update(request.query_string)
+    for part in parts:
+        digest.update(repr(part).encode())
+    return digest.hexdigest()
+
+
+def not_modified(etag):
+    """A 304 response if the client already holds this version, else None.
+
+    Checked before any data is built, so a repeat poll costs a few stat() calls.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+    return None
+
+
+def _compress(body):
+    if len(body) < API_COMPRESS_MIN_BYTES:
+        return body, None
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return brotli.compress(body, quality=API_BROTLI_QUALITY), "br"
+    if accepted["gzip"]:
+        return gzip.compress(body, compresslevel=API_GZIP_LEVEL), "gzip"
+    return body, None
+
+
+def json_response(data, etag=None, status=200):
+    """JSON response, compressed when large and the client accepts it."""
+    body, encoding = _compress(dumps(data))
+    response = Response(body, status=status, mimetype="application/json")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    if etag:
+        # Weak, so gzip/brotli/identity variants of the same data share one tag
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def _snapshot_versions():
+    return [dataset_version(name) for name in ("restaurants", "wines", "auction")]
+
+
+@api.route("/dashboard")
+def dashboard():
+    etag = make_etag(_snapshot_versions())
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    return json_response(get_dashboard_snapshot(), etag)
+
+
+@api.route("/wines")
+def wines():
+    etag = make_etag(dataset_version("wines"))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    page, page_size = get_page_args()
+    catalog = get_wine_catalog()
+    if not len(catalog):
+        return json_response({"items": [], "pagination": get_pagination(0, page, page_size)}, etag)
+
+    positions = catalog.filter(**get_wine_filters())
+    page_positions = catalog.page(positions, page=page, page_size=page_size, sort=request.args.get('sort'))
+    return json_response({
+        "items": catalog.records(page_positions).to_dict(orient='records'),
+        "pagination": get_pagination(len(positions), page, page_size),
+    }, etag)
+
+
+@api.route("/auction")
+def auction():
+    etag = make_etag(_snapshot_versions())
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    snapshot = get_dashboard_snapshot()
+    return json_response({
+        key: snapshot[key]
+        for key in (
+            "participating_restaurants", "participating_wines", "participating_companies",
+            "wine_price_distribution", "demand_distribution", "high_demand_wines", "auction_participation",
+        )
+    }, etag)
+
+
+@api.route("/auction/demand")
+def auction_demand():
+    # e.g. /api/v1/auction/demand?by=Wine_Type,country&wine_price_category=Cheap
+    etag = make_etag(dataset_version("auction"))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    by = tuple(dimension for dimension in request.args.get("by", ",".join(DEMAND_DIMENSIONS)).split(",") if dimension)
+    if not by or not set(by) <= set(DEMAND_DIMENSIONS):
+        return json_response({"error": f"'by' must be a comma-separated subset of {', '.join(DEMAND_DIMENSIONS)}"}, status=400)
+    filters = {dimension: request.args.get(dimension) for dimension in DEMAND_DIMENSIONS}
+    return json_response({"items": to_records(get_auction_analytics().demand(by=by, **filters))}, etag)
+
+
+@api.route("/restaurants/suppliers")
+def restaurant_suppliers():
+    # e.g. /api/v1/restaurants/suppliers?city=San Francisco&wine_type=Red&max_price=40&n=3
+    city = request.args.get("city", "San Francisco")
+    etag = make_etag(dataset_version("wines"), dataset_version("supplier_regions"), restaurant_cache.partition_version(city))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    page, page_size = get_page_args()
+    n = min(max(request.args.get("n", DEFAULT_MATCHES, type=int), 1), MAX_MATCHES)
+    # Every restaurant in the city is matched in one batch; pages select restaurants, not rows
+    matches = match_city(
+        city,
+        n=n,
+        wine_type=request.args.get("wine_type"),
+        min_price=request.args.get("min_price", type=float),
+        max_price=request.args.get("max_price", type=float),
+        max_distance_km=request.args.get("max_distance_km", type=float),
+    )
+    start = (page - 1) * page_size
+    on_page = matches[(matches["restaurant"] >= start) & (matches["restaurant"] < start + page_size)]
+    return json_response({
+        "items": on_page.to_dict(orient="records"),
+        "pagination": get_pagination(len(restaurant_cache.read_partition(city)), page, page_size),
+    }, etag)
+
+
+@api.route("/restaurants/delivery")
+def restaurant_delivery():
+    # e.g. /api/v1/restaurants/delivery?city=Los Angeles&max_distance_km=150
+    # Served from cached legs only: legs not routed yet come back "pending" and are
+    # fetched in the background, so a request never waits on TomTom
+    city = request.args.get("city", "San Francisco")
+    page, page_size = get_page_args()
+    etas = restaurant_delivery_etas(
+        city,
+        max_distance_km=request.args.get("max_distance_km", type=float),
+        offset=(page - 1) * page_size,
+        limit=page_size,
+        cached_only=True,
+    )
+    columns = [col for col in ("Restaurant Name", "Address", "Latitude", "Longitude", *MATRIX_COLUMNS) if col in etas.columns]
+    items = etas[columns].to_dict(orient="records")
+    # ETAs change as legs are routed or expire, so the tag covers the page itself
+    etag = make_etag(restaurant_cache.partition_version(city), items)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    return json_response({
+        "items": items,
+        "pagination": get_pagination(len(restaurant_cache.read_partition(city)), page, page_size),
+    }, etag)
+
+
+@api.route("/logistics")
+def logistics():
+    snapshot = logistics_refresher.get_snapshot()
+    if snapshot is None:
+        return json_response({"error": "Logistics data is being refreshed, please check back shortly."}, status=503)
+
+    etag = make_etag(snapshot["refreshed_at"])
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    return json_response(snapshot, etag)
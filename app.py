@@ -1,203 +1,145 @@
-import os
-from flask import Flask, render_template, request
-import pandas as pd
-from datetime import datetime
+from flask import Blueprint, Flask, Response, current_app, render_template, request, stream_with_context
+import data_store
 from fetch_restaurant_data import fetch_and_save_data
-from logistics_module import (
-    get_all_flights, 
-    find_best_flight, 
-    fetch_flight_data_with_rate_limit, 
-    get_weather_at_arrival, 
-    get_detailed_traffic_data, 
-    save_data_to_csv
-)
-
-app = Flask(__name__)
-
-# Absolute path to the project base directory
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_FOLDER = os.path.join(BASE_DIR, 'data')
-
-# Paths to data files
-restaurant_data_path = os.path.join(DATA_FOLDER, 'restaurant_and_wine_data.csv')
-wine_data_path = os.path.join(DATA_FOLDER, 'wine_restaurants.csv')
-auction_data_path = os.path.join(DATA_FOLDER, 'auction_data.csv')
-
-# Load and preprocess auction data
-auction_data = pd.read_csv(auction_data_path) if os.path.exists(auction_data_path) else pd.DataFrame()
+from dashboard import get_dashboard_snapshot
+from wine_catalog import get_wine_catalog
+from auction_analytics import get_auction_analytics, to_records
+import logistics_refresher
+from pagination import get_page_args, get_pagination, get_wine_filters
+from api import api
+import instrumentation
+
+# Page routes; create_app() registers them next to the JSON API
+pages = Blueprint('pages', __name__)
+
+# Companies need at least this many auction rows to be ranked on /auction
+COMPANY_MIN_ROWS = 10
+
+# Helper function to render a page, streaming it chunk by chunk when ?stream=1 is set
+def render_page(template_name, **context):
+    if request.args.get('stream', type=int):
+        current_app.update_template_context(context)
+        template = current_app.jinja_env.get_template(template_name)
+        return Response(stream_with_context(template.generate(context)), mimetype='text/html')
+    return render_template(template_name, **context)
 
 # Helper function to calculate dashboard data
 def get_dashboard_data():
-    # Load data from CSV files
-    if os.path.exists(restaurant_data_path):
-        restaurant_data = pd.read_csv(restaurant_data_path)
-    else:
-        restaurant_data = pd.DataFrame()
-
-    if os.path.exists(wine_data_path):
-        wine_data = pd.read_csv(wine_data_path)
-    else:
-        wine_data = pd.DataFrame()
-
-    # Auction data processing
-    if os.path.exists(auction_data_path):
-        auction_data = pd.read_csv(auction_data_path)
-    else:
-        auction_data = pd.DataFrame()
-
-    # General metrics
-    total_restaurants = restaurant_data['Restaurant Name'].nunique() if not restaurant_data.empty else 0
-    total_wines = wine_data['Wine Name'].nunique() if not wine_data.empty else 0
-
-    # Auction metrics
-    participating_restaurants = auction_data[auction_data['auction_restaurant_flag'] == 1]['Resturant_id'].nunique() if not auction_data.empty else 0
-    participating_wines = auction_data[auction_data['auction_wine_flag'] == 1]['Wine_Name'].nunique() if not auction_data.empty else 0
-    participating_companies = auction_data[auction_data['auction_company_flag'] == 1]['Company_Name'].nunique() if not auction_data.empty else 0
-
-    # Price and demand distributions for auctions
-    wine_price_distribution = auction_data['wine_price_category'].value_counts().to_dict() if not auction_data.empty else {}
-    demand_distribution = auction_data['demand_flag'].value_counts().to_dict() if not auction_data.empty else {}
-
-    # High demand wines
-    high_demand_wines = auction_data[auction_data['demand_flag'] == 'high demand']['Wine_Name'].value_counts().head(5).to_dict() if not auction_data.empty else {}
-
-    # Popular wine types and top suppliers with error handling for missing data
-    wine_type_counts = wine_data['Wine Type'].value_counts(normalize=True) * 100 if not wine_data.empty else {}
-    popular_wine_types = wine_type_counts.to_dict()
-    
-    # Ensure 'top_suppliers' is defined, even if there's no data
-    top_suppliers = wine_data['Company Name'].value_counts().nlargest(5).to_dict() if not wine_data.empty else {}
-
-    return {
-        "total_restaurants": total_restaurants,
-        "total_wines": total_wines,
-        "participating_restaurants": participating_restaurants,
-        "participating_wines": participating_wines,
-        "participating_companies": participating_companies,
-        "avg_wine_price": round(wine_data['Wine Price'].mean(), 2) if not wine_data.empty else 0,
-        "avg_tasting_score": round(wine_data['Tasting Score'].mean(), 2) if not wine_data.empty else 0,
-        "popular_wine_types": popular_wine_types,
-        "top_suppliers": top_suppliers,
-        "wine_price_distribution": wine_price_distribution,
-        "demand_distribution": demand_distribution,
-        "high_demand_wines": high_demand_wines
-    }
-
-# Helper function to return a default image URL based on the wine type
-def get_wine_image(wine_type):
-    wine_images = {
-        "Red": "https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcSMHCcX8j8urf0uLcbriIjnv5NHoQHwYBU_-g&s",  # Replace with real image URLs
-        "White": "https://www.coravin.com/cdn/shop/articles/types_of_white_wine.jpg?v=1725372804",
-        "Sparkling": "https://ricowines.com/wp-content/uploads/2024/01/white-Sparkling-1.webp",
-        "Rosé": "https://www.realsimple.com/thmb/t8ReENA47WfSPI4Z-VwitNYNWU0=/1500x0/filters:no_upscale():max_bytes(150000):strip_icc()/what-is-rose-GettyImages-1330692681-cf7d3da139524fcbaef63a3ab012821f.jpg",
-        "Dessert": "https://images.squarespace-cdn.com/content/v1/54217456e4b0423f1490b26a/1568582733342-6OBSIK7JFMDTH7T6FEAI/Wine+Pairing-7.jpg?format=1500w"
-    }
-    
-    # Default image if wine type not found
-    return wine_images.get(wine_type, "https://cdn.cluboenologique.com/wp-content/uploads/2022/03/02113400/vilafonte-675x450.jpg")  # Fallback image
+    # Precomputed once per dataset version (see dashboard.py)
+    return get_dashboard_snapshot()
 
-@app.route('/')
+@pages.route('/')
 def index():
     dashboard_data = get_dashboard_data()
     return render_template('index.html', dashboard_data=dashboard_data)
 
-@app.route('/restaurants')
+@pages.route('/restaurants')
 def restaurants():
     city = request.args.get('city', 'San Francisco')
     
-    # Fetch or use cached data
-    fetch_and_save_data(city)
-    
-    # Read the cached restaurant and wine data
-    if os.path.exists(restaurant_data_path):
-        restaurants = pd.read_csv(restaurant_data_path)
-    else:
-        print(f"Error: The file {restaurant_data_path} does not exist.")
-        restaurants = pd.DataFrame()
-    
-    return render_template('restaurant_data.html', restaurants=restaurants.to_dict(orient='records'))
+    # Fetch or use cached data for this city
+    restaurants = fetch_and_save_data(city)
+
+    # Only the requested page is converted to records and rendered
+    page, page_size = get_page_args()
+    start = (page - 1) * page_size
+    restaurant_records = restaurants.iloc[start:start + page_size].to_dict(orient='records')
+
+    return render_page(
+        'restaurant_data.html',
+        restaurants=restaurant_records,
+        pagination=get_pagination(len(restaurants), page, page_size)
+    )
 
-@app.route('/wines')
+@pages.route('/wines')
 def wines():
     # Get filter parameters from the request
-    wine_type = request.args.get('wine_type')
-    min_price = request.args.get('min_price', type=float)
-    max_price = request.args.get('max_price', type=float)
-    supplier = request.args.get('supplier')
-    min_score = request.args.get('min_score', type=float)
-    max_score = request.args.get('max_score', type=float)
-
-    if os.path.exists(wine_data_path):
-        wine_data = pd.read_csv(wine_data_path)
-    else:
-        print(f"Error: The file {wine_data_path} does not exist.")
-        wine_data = pd.DataFrame()
-
-    if wine_data.empty:
-        return render_template('wine_data.html', wines=[])
-
-    # Filter the wine data based on query parameters
-    if wine_type:
-        wine_data = wine_data[wine_data['Wine Type'].str.contains(wine_type, case=False)]
-    if supplier:
-        wine_data = wine_data[wine_data['Company Name'].str.contains(supplier, case=False)]
-    if min_price is not None:
-        wine_data = wine_data[wine_data['Wine Price'] >= min_price]
-    if max_price is not None:
-        wine_data = wine_data[wine_data['Wine Price'] <= max_price]
-    if min_score is not None:
-        wine_data = wine_data[wine_data['Tasting Score'] >= min_score]
-    if max_score is not None:
-        wine_data = wine_data[wine_data['Tasting Score'] <= max_score]
-
-    # Add image URL based on wine type
-    wine_data['Wine Image'] = wine_data['Wine Type'].apply(get_wine_image)
-
-    wine_records = wine_data.to_dict(orient='records')
-    return render_template('wine_data.html', wines=wine_records)
-
-@app.route('/auction')
-def auction():
-    # Load the auction data to display on the auction page
-    if os.path.exists(auction_data_path):
-        auction_data = pd.read_csv(auction_data_path)
-    else:
-        auction_data = pd.DataFrame()
+    filters = get_wine_filters()
+    sort = request.args.get('sort')
+    page, page_size = get_page_args()
+
+    # Indexed query over the catalog built once per dataset version (see wine_catalog.py)
+    catalog = get_wine_catalog()
+    if not len(catalog):
+        return render_page('wine_data.html', wines=[], pagination=get_pagination(0, page, page_size))
 
-    # Calculate the top auction metrics
-    high_demand_wines = auction_data[auction_data['demand_flag'] == 'high demand']['Wine_Name'].value_counts().head(5).to_dict()
-    auction_participation = auction_data['auction_restaurant_flag'].value_counts().to_dict()
+    positions = catalog.filter(**filters)
 
-    return render_template('auction.html', high_demand_wines=high_demand_wines, auction_participation=auction_participation)
+    # Only the requested page is converted to records and rendered
+    page_positions = catalog.page(positions, page=page, page_size=page_size, sort=sort)
+    wine_records = catalog.records(page_positions).to_dict(orient='records')
+    return render_page('wine_data.html', wines=wine_records, pagination=get_pagination(len(positions), page, page_size))
 
-@app.route('/logistics')
+@pages.route('/auction')
+def auction():
+    # Auction metrics come from the same precomputed snapshot as the dashboard,
+    # the richer views from cubes built once per dataset version (see auction_analytics.py)
+    snapshot = get_dashboard_snapshot()
+    analytics = get_auction_analytics()
+    country = request.args.get('country') or None
+    wine_type = request.args.get('wine_type') or None
+
+    return render_template(
+        'auction.html',
+        high_demand_wines=snapshot["high_demand_wines"],
+        auction_participation=snapshot["auction_participation"],
+        countries=analytics.dimension_values("country"),
+        wine_types=analytics.dimension_values("Wine_Type"),
+        demand_by_type=to_records(analytics.demand(by=("Wine_Type", "wine_price_category"), country=country, Wine_Type=wine_type)),
+        company_demand=to_records(analytics.company_demand(k=10, min_rows=COMPANY_MIN_ROWS)),
+        city_participation=to_records(analytics.city_participation(country)),
+        top_wines_by_demand=analytics.top_by_group("demand_flag")
+    )
+
+@pages.route('/logistics')
 def logistics():
-    all_flights = fetch_flight_data_with_rate_limit()
-    best_flight = None
-    arrival_weather = []
-    traffic_details = []
-
-    if all_flights:
-        best_flight = find_best_flight(all_flights)
-        
-        if best_flight:
-            arrival_time = best_flight["Arrival Time"]
-            arrival_weather = get_weather_at_arrival(arrival_time)
-            arrival_time_formatted = datetime.strptime(arrival_time, "%Y-%m-%dT%H:%M:%S").strftime("%B %d, %Y, %H:%M %p")
-            traffic_details = get_detailed_traffic_data()
-            save_data_to_csv(all_flights, best_flight, arrival_weather, traffic_details)
-
-            return render_template(
-                'logistics.html',
-                best_flight=best_flight,
-                arrival_weather=arrival_weather,
-                traffic_details=traffic_details,
-                arrival_time_formatted=arrival_time_formatted
-            )
-        else:
-            return render_template('logistics.html', error="No best flight found.")
-    else:
-        return render_template('logistics.html', error="Failed to fetch flight data.")
+    # Providers are called by the background refresher; the page only reads its latest snapshot
+    snapshot = logistics_refresher.get_snapshot()
+    if snapshot is None:
+        instrumentation.count_cache("logistics_snapshot", "missing")
+        return render_template('logistics.html', error="Logistics data is being refreshed, please check back shortly.")
+    instrumentation.count_cache("logistics_snapshot", "served")
+    # Whatever the last refresh did fetch is shown, next to the error if part of it failed
+    return render_template(
+        'logistics.html',
+        error=snapshot["error"],
+        best_flight=snapshot["best_flight"],
+        ranked_flights=snapshot.get("ranked_flights", []),
+        arrival_weather=snapshot["arrival_weather"],
+        traffic_details=snapshot["traffic_details"],
+        arrival_time_formatted=snapshot["arrival_time_formatted"],
+        refreshed_at=snapshot["refreshed_at"]
+    )
+
+def create_app():
+    """Build the Flask app.
+
+    Cheap to call: datasets, provider clients and background threads are all
+    created on first use (or up front by warm()).
+    """
+    instrumentation.configure_logging()
+    app = Flask(__name__)
+    app.register_blueprint(pages)
+    app.register_blueprint(api)
+    # Request/span timing, Server-Timing headers, /metrics and ?profile=1 (see instrumentation.py)
+    instrumentation.init_app(app)
+    return app
+
+def warm():
+    """Load every dataset, build the structures the pages read and compile the templates.
+
+    Called by gunicorn's master before it forks (see gunicorn.conf.py), so
+    workers start with everything in memory, shared copy-on-write.
+    """
+    data_store.preload()
+    get_dashboard_snapshot()
+    get_wine_catalog()
+    get_auction_analytics()
+    # Compile the templates too, so the first request of each worker skips it
+    for template_name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(template_name)
+
+app = create_app()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8080)
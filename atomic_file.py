@@ -0,0 +1,23 @@
+import os
+import threading
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_path(path):
+    """Yield a temporary path next to `path`, renamed over `path` when the block succeeds.
+
+    Readers in any process see either the old file or the complete new one,
+    never a half-written file. If the block raises, the temporary file is
+    removed and `path` is left as it was.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        # Only still there if the block or the rename failed
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
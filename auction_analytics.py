@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+from data_store import get_derived
+
+# Dimensions of the demand cube, outermost first
+DEMAND_DIMENSIONS = ("Wine_Type", "wine_price_category", "country")
+HIGH_DEMAND = "high demand"
+TOP_K = 5
+
+
+def _ratio(numerator, denominator):
+    # Elementwise division that leaves empty groups as NaN instead of inf
+    return numerator / denominator.where(denominator != 0)
+
+
+def _slice(frame, keys):
+    # Label slice of a sorted MultiIndex (binary searches, no full scan); no match is an empty frame
+    try:
+        return frame.loc[keys, :]
+    except KeyError:
+        return frame.iloc[:0]
+
+
+class AuctionAnalytics:
+    """Groupby cubes over the auction history, built once per dataset version.
+
+    Cubes keep additive measures (row counts and sums), so any rollup over
+    fewer dimensions is a sum over the cube rather than another pass over
+    the raw rows. Queries slice the sorted cube indexes.
+    """
+
+    def __init__(self, frame):
+        self.rows = len(frame)
+        if frame.empty:
+            self.demand_cube = pd.DataFrame()
+            self.companies = pd.DataFrame()
+            self.cities = pd.DataFrame()
+            self._top = {}
+            return
+
+        high_demand = (frame["demand_flag"] == HIGH_DEMAND).to_numpy(dtype='int64')
+        in_auction = frame["auction_normalised_demand"].notna()
+        measures = pd.DataFrame({
+            "rows": 1,
+            "high_demand_rows": high_demand,
+            "demand_sum": frame["normalised_demand"].to_numpy(),
+            "auction_rows": in_auction.to_numpy(dtype='int64'),
+            "auction_demand_sum": frame["auction_normalised_demand"].fillna(0).to_numpy(),
+        }, index=frame.index)
+
+        # Wine type x price category x country
+        keys = [frame[dimension] for dimension in DEMAND_DIMENSIONS]
+        self.demand_cube = measures.groupby(keys, observed=True).sum().sort_index()
+
+        # Per company: own demand vs demand at auction
+        companies = measures.groupby(frame["Company_Name"]).sum()
+        self.companies = pd.DataFrame({
+            "rows": companies["rows"],
+            "mean_normalised_demand": _ratio(companies["demand_sum"], companies["rows"]),
+            "mean_auction_normalised_demand": _ratio(companies["auction_demand_sum"], companies["auction_rows"]),
+        })
+        self.companies["demand_gap"] = self.companies["mean_auction_normalised_demand"] - self.companies["mean_normalised_demand"]
+        self.companies = self.companies.sort_index()
+
+        # Per city: distinct restaurants and how many of them took part in an auction
+        restaurants = pd.DataFrame({
+            "country": frame["country"],
+            "city": frame["city"],
+            "restaurant": frame["Resturant_id"],
+            "participating": frame["auction_restaurant_flag"].eq(1).to_numpy(dtype=bool, na_value=False),
+        }).drop_duplicates()
+        by_city = restaurants.groupby(["country", "city"], observed=True)
+        cities = pd.DataFrame({
+            "restaurants": by_city["restaurant"].nunique(),
+            "participating_restaurants": restaurants[restaurants["participating"]].groupby(["country", "city"], observed=True)["restaurant"].nunique(),
+        }).fillna(0).astype('int64')
+        cities["participation_rate"] = _ratio(cities["participating_restaurants"], cities["restaurants"])
+        self.cities = cities.sort_index()
+
+        # Wine counts per demand level and per country, sorted once so top-k is a head()
+        self._top = {
+            "demand_flag": self._ranked_counts(frame, "demand_flag", "Wine_Name"),
+            "country": self._ranked_counts(frame[high_demand == 1], "country", "Wine_Name"),
+        }
+
+    @staticmethod
+    def _ranked_counts(frame, group, item):
+        counts = frame.groupby([frame[group], frame[item]], observed=True).size()
+        counts = counts[counts > 0].reset_index(name="count")
+        # Highest count first within each group, ties by name
+        counts = counts.sort_values([group, "count", item], ascending=[True, False, True], kind="mergesort")
+        return {str(value): rows.set_index(item)["count"] for value, rows in counts.groupby(group, observed=True)}
+
+    def demand(self, by=DEMAND_DIMENSIONS, **filters):
+        """Demand rollup over `by`, optionally sliced on any cube dimension.
+
+        e.g. demand(by=("Wine_Type",), country="Spain")
+        """
+        unknown = [dimension for dimension, value in filters.items() if value is not None and dimension not in DEMAND_DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown demand dimension: {', '.join(unknown)}")
+        cube = self.demand_cube
+        if cube.empty:
+            return cube
+        keys = tuple(slice(None) if filters.get(dimension) is None else [filters[dimension]] for dimension in DEMAND_DIMENSIONS)
+        if any(key != slice(None) for key in keys):
+            cube = _slice(cube, keys)
+
+        rollup = cube.groupby(level=list(by), observed=True).sum() if tuple(by) != DEMAND_DIMENSIONS else cube
+        return rollup.assign(
+            mean_normalised_demand=_ratio(rollup["demand_sum"], rollup["rows"]),
+            high_demand_share=_ratio(rollup["high_demand_rows"], rollup["rows"]),
+            mean_auction_normalised_demand=_ratio(rollup["auction_demand_sum"], rollup["auction_rows"]),
+        )
+
+    def dimension_values(self, dimension):
+        """Values of a cube dimension that occur in the data, e.g. for filter dropdowns."""
+        if self.demand_cube.empty:
+            return []
+        return sorted(str(value) for value in self.demand_cube.index.get_level_values(dimension).unique())
+
+    def company_demand(self, k=None, sort="demand_gap", min_rows=1):
+        """Per-company mean demand vs mean auction demand, best `sort` first.
+
+        Companies with fewer than `min_rows` rows are left out.
+        """
+        companies = self.companies
+        if companies.empty:
+            return companies
+        companies = companies[companies["rows"] >= min_rows]
+        ranked = companies.sort_values(sort, ascending=False, na_position="last", kind="mergesort")
+        return ranked if k is None else ranked.head(k)
+
+    def city_participation(self, country=None):
+        """Restaurant participation rate per (country, city)."""
+        if country is None or self.cities.empty:
+            return self.cities
+        return _slice(self.cities, ([country], slice(None)))
+
+    def top(self, group, value, k=TOP_K):
+        """Top k wines by row count within one group, e.g. top("demand_flag", "high demand")."""
+        counts = self._top.get(group, {}).get(str(value))
+        if counts is None:
+            return {}
+        return {str(wine): int(count) for wine, count in counts.head(k).items()}
+
+    def top_by_group(self, group, k=TOP_K):
+        """Top k wines for every value of a group."""
+        return {value: self.top(group, value, k) for value in self._top.get(group, {})}
+
+
+def get_auction_analytics():
+    """Return the analytics for the current version of the auction dataset."""
+    return get_derived("auction", AuctionAnalytics)
+
+
+def to_records(frame):
+    """Cube rows as JSON/template-friendly dicts, with index levels as columns and NaN as None."""
+    if frame.empty:
+        return []
+    flat = frame.reset_index()
+    flat = flat.astype(object).where(flat.notna(), None)
+    return [
+        {key: (value.item() if isinstance(value, np.generic) else value) for key, value in row.items()}
+        for row in flat.to_dict(orient="records")
+    ]
@@ -0,0 +1,305 @@
+"""Benchmark the app's routes and data paths on synthetic data.
+
+For every --rows scale a synthetic data folder is generated (and reused on
+later runs), then a fresh worker process serves it with DATA_FOLDER pointing
+there and every external provider stubbed. Each scenario reports its cold
+(first call) latency, p50/p90/p99/max latency, throughput and how much
+resident memory it kept; the worker's peak RSS is reported per run.
+Results are written to benchmarks/results/<commit>.json so they can be
+compared between commits:
+
+    python -m benchmarks.run --rows 10000 100000 1000000
+    python -m benchmarks.run --rows 10000 --compare benchmarks/results/<other commit>.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import shutil
+import resource
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCHMARK_DIR)
+DATA_ROOT = os.path.join(BENCHMARK_DIR, ".data")
+RESULTS_FOLDER = os.path.join(BENCHMARK_DIR, "results")
+
+DEFAULT_ROWS = [10_000, 100_000]
+DEFAULT_ITERATIONS = 50
+# Caches the app derives from its data; cleared before each run so cold timings are comparable
+DERIVED_FOLDERS = (".snapshots", ".cache", ".locks", "restaurant_cache", "columnar")
+# Relative slowdown in p50 or p99 reported as a regression by --compare
+DEFAULT_THRESHOLD = 0.10
+
+WINE_QUERIES = [
+    "",
+    "?wine_type=Red",
+    "?min_price=20&max_price=60",
+    "?supplier=vine",
+    "?min_score=85&max_score=95",
+    "?wine_type=White&min_price=10&max_price=80&min_score=80&sort=-price",
+    "?sort=score&page=20",
+]
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _rss_mb():
+    # Current (not peak) resident memory; Linux only
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def measure(func, iterations):
+    """Time one cold call and `iterations` warm calls of func.
+
+    rss_delta_mb is how much resident memory grew (or shrank) across this
+    scenario's calls, i.e. what it allocated and kept; it is not a peak, and
+    is None where current RSS can't be read. The worker's peak RSS is
+    reported once per run, since the process high-water mark only grows.
+    """
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    func()
+    cold = time.perf_counter() - started
+
+    latencies = np.empty(iterations)
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        func()
+        latencies[i] = time.perf_counter() - call_started
+    elapsed = time.perf_counter() - started
+
+    rss_after = _rss_mb()
+
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+    return {
+        "iterations": iterations,
+        "cold_ms": round(cold * 1000, 3),
+        "mean_ms": round(latencies.mean() * 1000, 3),
+        "p50_ms": round(p50, 3),
+        "p90_ms": round(p90, 3),
+        "p99_ms": round(p99, 3),
+        "max_ms": round(latencies.max() * 1000, 3),
+        "throughput_rps": round(iterations / elapsed, 1) if elapsed else None,
+        "rss_delta_mb": round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None,
+    }
+
+
+def _get(client, url, status=200, headers=None):
+    def call():
+        response = client.get(url, headers=headers)
+        if response.status_code != status:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+        response.get_data()
+    return call
+
+
+def scenarios(rows):
+    """(name, callable) pairs exercised by the worker, built after the app is imported."""
+    import app as app_module
+    import logistics_module
+    import logistics_refresher
+    from ttl_cache import TTL_CACHE_FOLDER
+    from fetch_restaurant_data import load_cached_data
+    from data_store import get_dataset
+    from wine_matching import get_supplier_matcher
+    from benchmarks.synthetic_data import restaurant_cities
+
+    client = app_module.app.test_client()
+    cities = restaurant_cities(rows)
+    city_cycle = iter(np.resize(cities, 10_000))
+
+    # Restaurant coordinates for a batch match, scattered around the seed cities
+    restaurants = get_dataset("restaurants", columns=["Latitude", "Longitude"])
+    match_lats = np.resize(restaurants["Latitude"].to_numpy(dtype="float64"), 10_000)
+    match_lons = np.resize(restaurants["Longitude"].to_numpy(dtype="float64"), 10_000)
+
+    # Provider responses are TTL-cached in memory and on disk; the cold refresh drops both,
+    # so every provider call (rate limiting, HTTP through the stubs, parsing) is paid again
+    provider_caches = (logistics_module.get_all_flights, logistics_module.get_forecast, logistics_module.get_route)
+
+    def logistics_refresh_cold():
+        for cached in provider_caches:
+            cached.cache_clear()
+        shutil.rmtree(TTL_CACHE_FOLDER, ignore_errors=True)
+        logistics_refresher.build_snapshot()
+
+    # Publish a snapshot up front, so the logistics routes serve data instead of the "refreshing" page
+    logistics_refresher.refresh_once()
+
+    etag = client.get("/api/v1/wines?wine_type=Red").headers.get("ETag")
+    pairs = [
+        ("get_dashboard_data", app_module.get_dashboard_data),
+        ("GET /", _get(client, "/")),
+    ]
+    pairs += [(f"GET /wines{query}", _get(client, f"/wines{query}")) for query in WINE_QUERIES]
+    pairs += [
+        ("GET /auction", _get(client, "/auction")),
+        ("GET /auction?country=Spain", _get(client, "/auction?country=Spain")),
+        ("load_cached_data", lambda: load_cached_data(next(city_cycle))),
+        ("GET /restaurants", _get(client, f"/restaurants?city={cities[0]}")),
+        ("GET /api/v1/restaurants/suppliers?wine_type=Red&max_price=40",
+         _get(client, f"/api/v1/restaurants/suppliers?city={cities[0]}&wine_type=Red&max_price=40")),
+        ("GET /api/v1/restaurants/delivery",
+         _get(client, f"/api/v1/restaurants/delivery?city={cities[0]}&max_distance_km=20000")),
+        ("logistics refresh, cold provider caches", logistics_refresh_cold),
+        ("logistics refresh, warm provider caches", logistics_refresher.build_snapshot),
+        ("GET /logistics", _get(client, "/logistics")),
+        ("GET /api/v1/logistics", _get(client, "/api/v1/logistics")),
+        ("supplier match, 10k restaurants", lambda: get_supplier_matcher().match(match_lats, match_lons, n=5, wine_type="Red")),
+        ("GET /api/v1/wines?wine_type=Red", _get(client, "/api/v1/wines?wine_type=Red")),
+        ("GET /api/v1/wines (304)", _get(client, "/api/v1/wines?wine_type=Red", status=304, headers={"If-None-Match": etag})),
+    ]
+    return pairs
+
+
+def run_worker(data_folder, rows, iterations, output):
+    """Run every scenario in this process against data_folder and write the results as JSON."""
+    sys.path.insert(0, PROJECT_DIR)
+    results = {"rows": rows, "scenarios": {}}
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        started = time.perf_counter()
+        from benchmarks import stubs
+        stubs_adapter = stubs.install()
+        pairs = scenarios(rows)
+        results["startup_seconds"] = round(time.perf_counter() - started, 3)
+        for name, func in pairs:
+            results["scenarios"][name] = measure(func, iterations)
+        results["provider_calls"] = stubs_adapter.calls
+    results["peak_rss_mb"] = _peak_rss_mb()
+    with open(output, "w") as f:
+        json.dump(results, f)
+
+
+def run_scale(rows, iterations, seed):
+    from benchmarks.synthetic_data import generate
+
+    data_folder = os.path.join(DATA_ROOT, str(rows))
+    started = time.perf_counter()
+    if generate(data_folder, rows, seed):
+        print(f"Generated {rows} rows per dataset in {time.perf_counter() - started:.1f}s")
+
+    for folder in DERIVED_FOLDERS:
+        shutil.rmtree(os.path.join(data_folder, folder), ignore_errors=True)
+
+    env = dict(os.environ, DATA_FOLDER=data_folder)
+    # Keep per-request logs out of the report
+    env.setdefault("LOG_LEVEL", "WARNING")
+    # Time the provider code paths against the stubs, not the token buckets' waits
+    for provider in ("AMADEUS", "OPENWEATHERMAP", "TOMTOM"):
+        env.setdefault(f"{provider}_RATE_PER_SECOND", "1000000")
+        env.setdefault(f"{provider}_BURST", "1000000")
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        output = f.name
+    try:
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--worker", data_folder,
+             "--rows", str(rows), "--iterations", str(iterations), "--output", output],
+            cwd=PROJECT_DIR, env=env, check=True
+        )
+        with open(output) as f:
+            return json.load(f)
+    finally:
+        os.remove(output)
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=PROJECT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def results_path():
+    commit = _git("rev-parse", "--short", "HEAD") or "unknown"
+    dirty = bool(_git("status", "--porcelain", "--untracked-files=no"))
+    return os.path.join(RESULTS_FOLDER, f"{commit}{'-dirty' if dirty else ''}.json")
+
+
+def print_report(report):
+    for run in report["runs"]:
+        print(f"\n{run['rows']} rows (startup {run['startup_seconds']}s, peak RSS {run['peak_rss_mb']} MB, provider calls {run['provider_calls']})")
+        print(f"{'scenario':<60} {'cold':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'req/s':>9} {'RSS +MB':>9}")
+        for name, stats in run["scenarios"].items():
+            rss_delta = stats.get("rss_delta_mb")
+            print(f"{name:<60} {stats['cold_ms']:>9.2f} {stats['p50_ms']:>9.2f} {stats['p90_ms']:>9.2f} {stats['p99_ms']:>9.2f} "
+                  f"{stats['throughput_rps']:>9.1f} {rss_delta if rss_delta is not None else '-':>9}")
+
+
+def compare(report, baseline, threshold):
+    """Print p50/p99 changes against a baseline report. Returns the number of regressions."""
+    baseline_runs = {run["rows"]: run for run in baseline["runs"]}
+    regressions = 0
+    print(f"\nCompared with {baseline.get('commit')} (regression threshold {threshold:.0%})")
+    for run in report["runs"]:
+        old_run = baseline_runs.get(run["rows"])
+        if old_run is None:
+            continue
+        print(f"\n{run['rows']} rows")
+        for name, stats in run["scenarios"].items():
+            old = old_run["scenarios"].get(name)
+            if old is None:
+                continue
+            changes = {metric: stats[metric] / old[metric] - 1 if old[metric] else 0.0 for metric in ("p50_ms", "p99_ms")}
+            regressed = any(change > threshold for change in changes.values())
+            regressions += regressed
+            print(f"{'!' if regressed else ' '} {name:<60} p50 {old['p50_ms']:>8.2f} -> {stats['p50_ms']:>8.2f} ({changes['p50_ms']:+.0%})"
+                  f"  p99 {old['p99_ms']:>8.2f} -> {stats['p99_ms']:>8.2f} ({changes['p99_ms']:+.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Flask routes and data paths on synthetic data.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="Rows per dataset, one run per value")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="Warm calls per scenario")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", help="Results file of another commit to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.worker, args.rows[0], args.iterations, args.output)
+        return 0
+
+    report = {
+        "commit": _git("rev-parse", "HEAD"),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "iterations": args.iterations,
+        "runs": [run_scale(rows, args.iterations, args.seed) for rows in args.rows],
+    }
+    print_report(report)
+
+    os.makedirs(RESULTS_FOLDER, exist_ok=True)
+    path = results_path()
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            return 1 if compare(report, json.load(f), args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Report what a fresh process spends before it can serve a request.
+
+Imports the app in a clean interpreter with `python -X importtime`, then
+times create_app() and warm() (the dataset preload gunicorn's master runs
+before forking). Import cost is summed per top-level package, with the
+app's own modules listed separately:
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --top 30 --no-warm
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+from collections import defaultdict
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCHMARK_DIR)
+DEFAULT_TOP = 15
+
+# Runs in the child process; the timings go to stdout, -X importtime writes to stderr
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+if {warm}:
+    app.warm()
+warmed = time.perf_counter()
+json.dump({{"import_app": imported - started, "create_app": created - imported, "warm": warmed - created}}, sys.stdout)
+"""
+
+
+def parse_importtime(lines):
+    """(module, self_us, cumulative_us, depth) for each `import time:` line."""
+    modules = []
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+def _first_party():
+    return {name[:-3] for name in os.listdir(PROJECT_DIR) if name.endswith(".py")}
+
+
+def profile_startup(warm=True):
+    """Import the app in a fresh interpreter and return (phase timings, import records)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(warm=warm)],
+        cwd=PROJECT_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing the app failed:\n{result.stderr}")
+    return json.loads(result.stdout), parse_importtime(result.stderr.splitlines())
+
+
+def report(phases, modules, top=DEFAULT_TOP):
+    first_party = _first_party()
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in modules:
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"import app  {phases['import_app'] * 1000:>9.1f} ms")
+    print(f"create_app  {phases['create_app'] * 1000:>9.1f} ms")
+    print(f"warm        {phases['warm'] * 1000:>9.1f} ms")
+
+    print(f"\nApp modules (self time; cumulative includes the packages they pull in first)")
+    print(f"{'module':<40} {'self ms':>9} {'cumul. ms':>9}")
+    for name, self_us, cumulative_us, _ in sorted((m for m in modules if m[0] in first_party), key=lambda m: -m[2]):
+        print(f"{name:<40} {self_us / 1000:>9.1f} {cumulative_us / 1000:>9.1f}")
+
+    print(f"\nTop {top} third-party packages (summed self time)")
+    packages = sorted(((name, us) for name, us in by_package.items() if name not in first_party), key=lambda p: -p[1])
+    for name, us in packages[:top]:
+        print(f"{name:<40} {us / 1000:>9.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report per-module import cost and app startup time.")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="Third-party packages to list")
+    parser.add_argument("--no-warm", action="store_true", help="Skip timing the dataset preload")
+    args = parser.parse_args(argv)
+    phases, modules = profile_startup(warm=not args.no_warm)
+    report(phases, modules, top=args.top)
+
+
+if __name__ == "__main__":
+    main()
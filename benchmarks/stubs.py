@@ -0,0 +1,111 @@
+"""Offline stand-ins for the external providers, so benchmarks never touch the network.
+
+HTTP providers (Google Places, OpenWeatherMap, TomTom) are answered by a
+transport adapter mounted on the shared http_pool session, so the app's own
+request code still runs. The Amadeus SDK client is replaced by a stub that
+returns a fixed set of offers.
+"""
+import json
+import time
+from requests.adapters import BaseAdapter
+from requests.models import Response
+
+FORECAST_SLOTS = 40
+
+
+def _forecast():
+    start = int(time.time()) // 10800 * 10800
+    return {"list": [{
+        "dt": start + slot * 10800,
+        "main": {"temp": 18.0, "temp_max": 21.0, "temp_min": 14.0, "humidity": 60},
+        "weather": [{"description": "clear sky"}],
+        "wind": {"speed": 3.5, "deg": 240},
+        "clouds": {"all": 10},
+    } for slot in range(FORECAST_SLOTS)]}
+
+
+def _route():
+    return {"routes": [{
+        "summary": {"lengthInMeters": 150000, "travelTimeInSeconds": 7200, "trafficDelayInSeconds": 300},
+        "sections": [{
+            "startPoint": {"latitude": 33.9416, "longitude": -118.4085},
+            "endPoint": {"latitude": 34.5889, "longitude": -120.0382},
+            "summary": {"lengthInMeters": 150000, "travelTimeInSeconds": 7200, "trafficDelayInSeconds": 300,
+                        "speedInMetersPerSecond": 20.8},
+            "trafficLevel": "moderate",
+        }],
+    }]}
+
+
+def _places(url):
+    if "/details/" in url:
+        return {"result": {"name": "Stub Bistro", "formatted_address": "1 Stub St", "geometry": {"location": {"lat": 37.77, "lng": -122.42}}}}
+    return {"results": [{"name": f"Stub Bistro {i}", "place_id": f"stub-{i}"} for i in range(20)]}
+
+
+class StubAdapter(BaseAdapter):
+    """Answers provider URLs with canned JSON and counts the calls."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def send(self, request, **kwargs):
+        self.calls += 1
+        if "openweathermap" in request.url:
+            body = _forecast()
+        elif "tomtom" in request.url or "calculateRoute" in request.url:
+            body = _route()
+        else:
+            body = _places(request.url)
+        response = Response()
+        response.status_code = 200
+        response._content = json.dumps(body).encode()
+        response.headers["Content-Type"] = "application/json"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def _offers(count=20):
+    return [{
+        "id": str(i),
+        "price": {"total": f"{15000 + i * 250:.2f}", "currency": "ZAR"},
+        "itineraries": [{
+            "duration": f"PT{20 + i % 6}H{(i * 7) % 60}M",
+            "segments": [
+                {"departure": {"iataCode": "CPT", "at": "2024-12-01T18:25:00"}, "arrival": {"iataCode": "LAX", "at": "2024-12-02T12:45:00"}, "carrierCode": "EK"},
+            ] if i % 2 == 0 else [
+                {"departure": {"iataCode": "CPT", "at": "2024-12-01T18:25:00"}, "arrival": {"iataCode": "DXB", "at": "2024-12-02T05:00:00"}, "carrierCode": "EK"},
+                {"departure": {"iataCode": "DXB", "at": "2024-12-02T08:00:00"}, "arrival": {"iataCode": "LAX", "at": "2024-12-02T12:45:00"}, "carrierCode": "EK"},
+            ],
+        }],
+        "travelerPricings": [{"fareDetailsBySegment": [{"cabin": "ECONOMY"}]}],
+    } for i in range(count)]
+
+
+class _AmadeusStub:
+    class _Response:
+        data = _offers()
+
+    class shopping:
+        class flight_offers_search:
+            @staticmethod
+            def get(**kwargs):
+                return _AmadeusStub._Response
+
+
+def install():
+    """Route every provider call in this process to the stubs. Returns the HTTP adapter."""
+    import http_pool
+    import logistics_module
+
+    adapter = StubAdapter()
+    session = http_pool.get_session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    logistics_module.amadeus = _AmadeusStub
+    return adapter
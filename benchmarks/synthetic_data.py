@@ -0,0 +1,126 @@
+"""Scaled synthetic copies of the app's datasets for benchmarking.
+
+Rows are bootstrapped from the real CSVs in data/, so every column, dtype,
+category and null pattern follows the real schema. Ids, names and the
+numeric columns the app filters on are then re-drawn so that cardinalities
+grow with the row count instead of repeating the seed rows.
+
+    python -m benchmarks.synthetic_data --rows 1000000 --output benchmarks/.data/1000000
+"""
+import os
+import json
+import shutil
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from atomic_file import atomic_path
+from data_store import BASE_DIR, DATASETS
+
+# Real datasets the synthetic rows are drawn from
+SEED_FOLDER = os.path.join(BASE_DIR, "data")
+# Rows generated and written per chunk, so 10M-row files never sit in memory at once
+CHUNK_ROWS = 250_000
+# Restaurants per synthetic city, which sets the number of restaurant cache partitions
+RESTAURANTS_PER_CITY = 500
+MANIFEST_FILE = "manifest.json"
+# Small lookup datasets copied as they are, so every synthetic row still finds its match
+REFERENCE_DATASETS = ("supplier_regions",)
+
+
+def _seed(name):
+    return pd.read_csv(os.path.join(SEED_FOLDER, DATASETS[name]["file"]))
+
+
+def _sample(seed, rows, rng):
+    return seed.iloc[rng.integers(0, len(seed), rows)].reset_index(drop=True)
+
+
+def synthesize_wines(seed, rows, offset, total_rows, rng):
+    frame = _sample(seed, rows, rng)
+    frame["Resturant id"] = rng.integers(1, max(total_rows // 4, 1) + 1, rows)
+    frame["Wine Price"] = (frame["Wine Price"] * rng.uniform(0.8, 1.2, rows)).round(2)
+    frame["Tasting Score"] = (frame["Tasting Score"] + rng.normal(0, 1.0, rows)).clip(60, 100).round(1)
+    return frame
+
+
+def synthesize_auction(seed, rows, offset, total_rows, rng):
+    frame = _sample(seed, rows, rng)
+    restaurant_ids = rng.integers(1, max(total_rows // 4, 1) + 1, rows)
+    frame["Resturant_id"] = restaurant_ids
+    # Auction rows point back at their own restaurant; keep the seed's null pattern
+    in_auction = frame["auction_restaurant_id"].notna().to_numpy()
+    frame["auction_restaurant_id"] = np.where(in_auction, restaurant_ids, np.nan)
+    return frame
+
+
+def synthesize_restaurants(seed, rows, offset, total_rows, rng):
+    frame = _sample(seed, rows, rng)
+    positions = np.arange(offset, offset + rows)
+    frame["City"] = frame["City"].astype(str) + " " + (positions // RESTAURANTS_PER_CITY).astype(str)
+    frame["Restaurant Name"] = frame["Restaurant Name"].astype(str) + " #" + positions.astype(str)
+    frame["Latitude"] = frame["Latitude"] + rng.normal(0, 0.05, rows)
+    frame["Longitude"] = frame["Longitude"] + rng.normal(0, 0.05, rows)
+    # Fresh timestamps, so cached cities are served without calling Google Places
+    frame["Timestamp"] = datetime.now()
+    return frame
+
+
+SYNTHESIZERS = {
+    "wines": synthesize_wines,
+    "auction": synthesize_auction,
+    "restaurants": synthesize_restaurants,
+}
+
+
+def restaurant_cities(rows):
+    """Names of the synthetic cities for a given restaurant row count."""
+    seed_cities = sorted(_seed("restaurants")["City"].astype(str).unique())
+    return [f"{city} {k}" for k in range(max((rows + RESTAURANTS_PER_CITY - 1) // RESTAURANTS_PER_CITY, 1)) for city in seed_cities]
+
+
+def write_dataset(name, folder, rows, seed=0):
+    """Write `rows` synthetic rows for one dataset, chunk by chunk."""
+    rng = np.random.default_rng([seed, list(SYNTHESIZERS).index(name)])
+    seed_frame = _seed(name)
+    path = os.path.join(folder, DATASETS[name]["file"])
+    with atomic_path(path) as tmp_path:
+        for offset in range(0, rows, CHUNK_ROWS):
+            chunk = SYNTHESIZERS[name](seed_frame, min(CHUNK_ROWS, rows - offset), offset, rows, rng)
+            chunk.to_csv(tmp_path, mode="w" if offset == 0 else "a", header=offset == 0, index=False)
+    return path
+
+
+def generate(folder, rows, seed=0):
+    """Generate every dataset with `rows` rows into folder, unless an identical set is already there."""
+    manifest = {"rows": rows, "seed": seed, "datasets": sorted(SYNTHESIZERS), "reference": list(REFERENCE_DATASETS)}
+    manifest_path = os.path.join(folder, MANIFEST_FILE)
+    try:
+        with open(manifest_path) as f:
+            if json.load(f) == manifest:
+                return False
+    except (OSError, ValueError):
+        pass
+
+    os.makedirs(folder, exist_ok=True)
+    for name in SYNTHESIZERS:
+        write_dataset(name, folder, rows, seed)
+    for name in REFERENCE_DATASETS:
+        shutil.copyfile(os.path.join(SEED_FOLDER, DATASETS[name]["file"]), os.path.join(folder, DATASETS[name]["file"]))
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate scaled synthetic datasets for benchmarking.")
+    parser.add_argument("--rows", type=int, required=True, help="Rows per dataset")
+    parser.add_argument("--output", required=True, help="Folder to write the CSVs to")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    generated = generate(args.output, args.rows, args.seed)
+    print(f"{'Generated' if generated else 'Reusing'} {args.rows} rows per dataset in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
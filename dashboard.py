@@ -0,0 +1,191 @@
+import os
+import logging
+import json
+import hashlib
+import threading
+from collections import Counter
+from atomic_file import atomic_path
+from data_store import DATA_FOLDER, get_dataset, dataset_version, dataset_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Snapshots are persisted next to the data so freshly started workers can pick
+# them up without touching the source CSVs
+SNAPSHOT_FOLDER = os.path.join(DATA_FOLDER, '.snapshots')
+SNAPSHOT_DATASETS = ("restaurants", "wines", "auction")
+# Bump when the snapshot layout or aggregation changes, so persisted snapshots are recomputed
+SNAPSHOT_VERSION = 2
+# Only these columns are loaded to build the snapshot
+SNAPSHOT_COLUMNS = {
+    "restaurants": ["Restaurant Name"],
+    "wines": ["Wine Name", "Wine Type", "Wine Price", "Company Name", "Tasting Score"],
+    "auction": [
+        "Resturant_id", "Wine_Name", "Company_Name", "auction_restaurant_flag", "auction_wine_flag",
+        "auction_company_flag", "wine_price_category", "demand_flag",
+    ],
+}
+
+# In-memory snapshot for this worker: {"versions": tuple, "data": dict}
+_snapshot = {"versions": None, "data": None}
+_lock = threading.Lock()
+
+
+def _counts(series):
+    # value_counts on a categorical keeps zero-count categories; drop them
+    counts = series.value_counts()
+    return Counter({(key.item() if hasattr(key, "item") else key): int(value) for key, value in counts.items() if value > 0})
+
+
+def _distinct(series):
+    return set(series.dropna().unique().tolist())
+
+
+def _top(counts, n=5):
+    # Highest count first; ties broken by value so merged and direct results agree
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))
+    return {str(key): int(value) for key, value in ranked[:n]}
+
+
+def snapshot_partial(name, frame):
+    """The dashboard aggregates of one dataset (or one chunk of it) in mergeable form.
+
+    Distinct counts are kept as sets, counts as Counters and means as sums,
+    so partials of separate chunks combine with merge_partials.
+    """
+    if frame.empty:
+        return {}
+    if name == "restaurants":
+        return {"restaurant_names": _distinct(frame['Restaurant Name'])}
+    if name == "wines":
+        return {
+            "wine_names": _distinct(frame['Wine Name']),
+            "price_sum": float(frame['Wine Price'].sum()),
+            "price_count": int(frame['Wine Price'].count()),
+            "score_sum": float(frame['Tasting Score'].sum()),
+            "score_count": int(frame['Tasting Score'].count()),
+            "wine_types": _counts(frame['Wine Type']),
+            "suppliers": _counts(frame['Company Name']),
+        }
+    return {
+        "participating_restaurants": _distinct(frame.loc[frame['auction_restaurant_flag'] == 1, 'Resturant_id']),
+        "participating_wines": _distinct(frame.loc[frame['auction_wine_flag'] == 1, 'Wine_Name']),
+        "participating_companies": _distinct(frame.loc[frame['auction_company_flag'] == 1, 'Company_Name']),
+        "price_categories": _counts(frame['wine_price_category']),
+        "demand": _counts(frame['demand_flag']),
+        "high_demand_wines": _counts(frame.loc[frame['demand_flag'] == 'high demand', 'Wine_Name']),
+        "participation": _counts(frame['auction_restaurant_flag']),
+    }
+
+
+def merge_partials(left, right):
+    """Combine two partials of the same dataset: sets are unioned, counts and sums added."""
+    merged = dict(left)
+    for key, value in right.items():
+        if key not in merged:
+            merged[key] = value
+        elif isinstance(value, set):
+            merged[key] = merged[key] | value
+        else:
+            merged[key] = merged[key] + value
+    return merged
+
+
+def finalize_snapshot(partials):
+    """Build the dashboard snapshot from one merged partial per dataset."""
+    restaurants, wines, auction = (partials.get(name) or {} for name in SNAPSHOT_DATASETS)
+    wine_types = wines.get("wine_types", Counter())
+    total_typed = sum(wine_types.values())
+    participation = auction.get("participation", Counter())
+    return {
+        "total_restaurants": len(restaurants.get("restaurant_names", ())),
+        "total_wines": len(wines.get("wine_names", ())),
+        "participating_restaurants": len(auction.get("participating_restaurants", ())),
+        "participating_wines": len(auction.get("participating_wines", ())),
+        "participating_companies": len(auction.get("participating_companies", ())),
+        "avg_wine_price": round(wines["price_sum"] / wines["price_count"], 2) if wines.get("price_count") else 0,
+        "avg_tasting_score": round(wines["score_sum"] / wines["score_count"], 2) if wines.get("score_count") else 0,
+        "popular_wine_types": {key: count / total_typed * 100 for key, count in _top(wine_types, n=None).items()},
+        "top_suppliers": _top(wines.get("suppliers", Counter())),
+        "wine_price_distribution": _top(auction.get("price_categories", Counter()), n=None),
+        "demand_distribution": _top(auction.get("demand", Counter()), n=None),
+        "high_demand_wines": _top(auction.get("high_demand_wines", Counter())),
+        "auction_participation": {
+            "participating": int(participation.get(1, 0)),
+            "non_participating": int(participation.get(0, 0)),
+        },
+    }
+
+
+def compute_dashboard_snapshot(restaurant_data, wine_data, auction_data):
+    """Compute every aggregate shown on the dashboard and auction pages as plain JSON-safe values."""
+    frames = dict(zip(SNAPSHOT_DATASETS, (restaurant_data, wine_data, auction_data)))
+    return finalize_snapshot({name: snapshot_partial(name, frame) for name, frame in frames.items()})
+
+
+def _snapshot_key():
+    # Key persisted snapshots on the snapshot format and the content of every
+    # source file, so a rewritten-but-identical CSV still reuses the existing snapshot
+    digest = hashlib.sha1(f"v{SNAPSHOT_VERSION};".encode())
+    for name in SNAPSHOT_DATASETS:
+        digest.update(f"{name}:{dataset_fingerprint(name)};".encode())
+    return digest.hexdigest()
+
+
+def _load_persisted(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _persist(path, snapshot):
+    os.makedirs(SNAPSHOT_FOLDER, exist_ok=True)
+    try:
+        with atomic_path(path) as tmp_path, open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+    except OSError as e:
+        logger.warning("Failed to persist dashboard snapshot to %s: %s", path, e)
+        return
+
+    # Drop snapshots for older dataset versions
+    for file_name in os.listdir(SNAPSHOT_FOLDER):
+        old_path = os.path.join(SNAPSHOT_FOLDER, file_name)
+        if file_name.startswith("dashboard-") and file_name.endswith(".json") and old_path != path:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+
+def persist_snapshot(snapshot):
+    """Store a snapshot computed elsewhere (e.g. by ingest.py) for the current dataset versions."""
+    path = os.path.join(SNAPSHOT_FOLDER, f"dashboard-{_snapshot_key()}.json")
+    _persist(path, snapshot)
+    return path
+
+
+def get_dashboard_snapshot():
+    """Return the dashboard snapshot for the current dataset versions.
+
+    Serving an unchanged snapshot costs a couple of stat() calls per source file. When a
+    source changes, the snapshot is loaded from disk if another worker already
+    computed it, and recomputed otherwise.
+    """
+    versions = tuple(dataset_version(name) for name in SNAPSHOT_DATASETS)
+    if _snapshot["versions"] == versions:
+        return _snapshot["data"]
+
+    with _lock:
+        if _snapshot["versions"] == versions:
+            return _snapshot["data"]
+
+        path = os.path.join(SNAPSHOT_FOLDER, f"dashboard-{_snapshot_key()}.json")
+        snapshot = _load_persisted(path)
+        if snapshot is None:
+            snapshot = compute_dashboard_snapshot(*(get_dataset(name, columns=SNAPSHOT_COLUMNS[name]) for name in SNAPSHOT_DATASETS))
+            _persist(path, snapshot)
+
+        _snapshot["versions"] = versions
+        _snapshot["data"] = snapshot
+        return snapshot
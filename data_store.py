@@ -0,0 +1,282 @@
+import os
+import logging
+import hashlib
+import threading
+from importlib.util import find_spec
+import pandas as pd
+import numpy as np
+from instrumentation import timed
+
+logger = logging.getLogger(__name__)
+
+# Columnar files are optional; without pyarrow the CSVs are read directly.
+# pyarrow itself is only imported on the first columnar read, keeping it off the startup path
+HAVE_PYARROW = find_spec("pyarrow") is not None
+
+# Absolute path to the project data directory (overridable, e.g. to serve synthetic benchmark data)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_FOLDER = os.getenv('DATA_FOLDER', os.path.join(BASE_DIR, 'data'))
+# Typed columnar copies of the CSVs, written by ingest.py
+COLUMNAR_FOLDER = os.path.join(DATA_FOLDER, 'columnar')
+
+# Datasets served to the web app, with their dtypes fixed up front so every
+# worker parses them the same way (and low-cardinality strings stay compact).
+# Integer columns use the nullable Int dtypes, so a blank cell in an export loads as <NA>
+DATASETS = {
+    "restaurants": {
+        "file": "restaurant_and_wine_data.csv",
+        "dtype": {
+            "City": "category",
+            "Wine Type": "category",
+            "Supplier": "category",
+            "Quality Tier": "category",
+            "Latitude": "float64",
+            "Longitude": "float64",
+        },
+        "parse_dates": ["Timestamp"],
+    },
+    "wines": {
+        "file": "wine_restaurants.csv",
+        "dtype": {
+            "Resturant id": "Int64",
+            "Wine Type": "category",
+            "Wine Price": "float64",
+            "Location": "category",
+            "Tasting Score": "float64",
+        },
+        "parse_dates": None,
+    },
+    "auction": {
+        "file": "auction_data.csv",
+        "dtype": {
+            "Resturant_id": "Int64",
+            "Wine_Type": "category",
+            "Wine_Price": "float64",
+            "Location": "category",
+            "Tasting_Score": "float64",
+            "normalised_demand": "float64",
+            "Owner_demand": "Int8",
+            "auction_restaurant_id": "float64",
+            "auction_normalised_demand": "float64",
+            "wine_price_rands": "float64",
+            "city": "category",
+            "country": "category",
+            "wine_price_rands_flag": "category",
+            "taste_score_flag": "category",
+            "auction_restaurant_flag": "Int8",
+            "auction_wine_flag": "Int8",
+            "auction_company_flag": "Int8",
+            "wine_price_category": "category",
+            "taste_category": "category",
+            "auction_restaurant_category": "category",
+            "auction_wine_category": "category",
+            "auction_company_category": "category",
+            "demand_flag": "category",
+        },
+        "parse_dates": None,
+    },
+    # Approximate coordinates of every wine region a supplier is listed under
+    "supplier_regions": {
+        "file": "supplier_regions.csv",
+        "dtype": {
+            "Country": "category",
+            "Latitude": "float64",
+            "Longitude": "float64",
+        },
+        "parse_dates": None,
+    },
+}
+
+# Loaded datasets keyed by (name, columns): {"version": (path, mtime_ns, size), "frame": DataFrame}
+_cache = {}
+# Content hashes keyed by name: {"version": (path, mtime_ns, size), "sha1": str}
+_fingerprints = {}
+# Objects built from a loaded frame (indexes, aggregates), keyed by (name, builder)
+_derived = {}
+# Callbacks that bring a dataset's source file up to date before it is looked up, keyed by name
+_refreshers = {}
+_lock = threading.Lock()
+_derived_lock = threading.Lock()
+
+
+def dataset_path(name):
+    return os.path.join(DATA_FOLDER, DATASETS[name]["file"])
+
+
+def columnar_path(name):
+    return os.path.join(COLUMNAR_FOLDER, os.path.splitext(DATASETS[name]["file"])[0] + ".feather")
+
+
+def register_refresher(name, refresher):
+    """Call refresher() before every lookup of a dataset's source file.
+
+    For sources assembled from other files (e.g. the combined restaurant CSV);
+    the refresher should cost no more than a stat() when nothing changed.
+    """
+    _refreshers[name] = refresher
+
+
+def _stat(path):
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+def dataset_source(name):
+    """Return (path, stat) of the file a dataset is read from, or (None, None) if it is missing.
+
+    The columnar copy is preferred when pyarrow is installed and the copy is at
+    least as new as the CSV; otherwise the CSV is read directly.
+    """
+    refresher = _refreshers.get(name)
+    if refresher is not None:
+        refresher()
+    csv_path = dataset_path(name)
+    csv_stat = _stat(csv_path)
+    if HAVE_PYARROW:
+        columnar_stat = _stat(columnar_path(name))
+        if columnar_stat is not None and (csv_stat is None or columnar_stat.st_mtime_ns >= csv_stat.st_mtime_ns):
+            return columnar_path(name), columnar_stat
+    if csv_stat is not None:
+        return csv_path, csv_stat
+    return None, None
+
+
+def dataset_version(name):
+    """Return a cheap version stamp (path, mtime, size) for a dataset, or None if it is missing."""
+    path, stat = dataset_source(name)
+    if path is None:
+        return None
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+def dataset_fingerprint(name):
+    """Return the SHA-1 of a dataset file, hashed once per version. None if the file is missing."""
+    version = dataset_version(name)
+    if version is None:
+        return None
+
+    entry = _fingerprints.get(name)
+    if entry is not None and entry["version"] == version:
+        return entry["sha1"]
+
+    digest = hashlib.sha1()
+    with open(version[0], 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    _fingerprints[name] = {"version": version, "sha1": digest.hexdigest()}
+    return _fingerprints[name]["sha1"]
+
+
+def _freeze(frame):
+    # Mark the underlying arrays read-only so a route mutating a shared frame
+    # in place fails loudly instead of corrupting it for every other request
+    for block in getattr(frame._mgr, "blocks", ()):
+        values = getattr(block, "values", None)
+        if isinstance(values, np.ndarray):
+            values.flags.writeable = False
+    return frame
+
+
+def read_csv_typed(name, path=None, columns=None):
+    """Parse a dataset CSV with its declared dtypes (optionally only some columns)."""
+    usecols = (lambda col: col in columns) if columns is not None else None
+    frame = pd.read_csv(path or dataset_path(name), usecols=usecols)
+    return apply_dtypes(name, frame)
+
+
+def apply_dtypes(name, frame):
+    spec = DATASETS[name]
+    # Only apply dtypes for columns that are actually present, so an older
+    # file with a slightly different schema still loads
+    dtypes = {col: dtype for col, dtype in spec["dtype"].items() if col in frame.columns}
+    try:
+        frame = frame.astype(dtypes)
+    except (ValueError, TypeError):
+        # A column with values that do not fit its dtype is kept as parsed
+        # instead of failing the whole dataset
+        for col, dtype in dtypes.items():
+            try:
+                frame[col] = frame[col].astype(dtype)
+            except (ValueError, TypeError) as e:
+                logger.warning("Column '%s' of dataset '%s' is not %s (%s); keeping it as %s", col, name, dtype, e, frame[col].dtype)
+    for col in spec["parse_dates"] or []:
+        if col in frame.columns:
+            frame[col] = pd.to_datetime(frame[col], errors='coerce')
+    return frame
+
+
+@timed("dataset_load")
+def _read(name, path, columns):
+    if path.endswith(".feather"):
+        from pyarrow import feather
+
+        # Memory-mapped, so columns that are not projected are never paged in
+        table = feather.read_table(path, memory_map=True)
+        if columns is not None:
+            table = table.select([col for col in table.column_names if col in columns])
+        frame = table.to_pandas()
+    else:
+        frame = read_csv_typed(name, path=path, columns=columns)
+    return _freeze(frame)
+
+
+def get_dataset(name, columns=None):
+    """Return the shared, read-only frame for a dataset.
+
+    The file is parsed once per worker and only re-read when its mtime or size
+    changes. Pass `columns` to load only the columns a caller needs; each
+    projection is cached separately. Callers must copy before mutating.
+    """
+    version = dataset_version(name)
+    if version is None:
+        return pd.DataFrame()
+
+    key = (name, tuple(columns) if columns is not None else None)
+    entry = _cache.get(key)
+    if entry is not None and entry["version"] == version:
+        return entry["frame"]
+
+    with _lock:
+        # Another thread may have reloaded while we waited for the lock
+        entry = _cache.get(key)
+        if entry is not None and entry["version"] == version:
+            return entry["frame"]
+        try:
+            frame = _read(name, version[0], columns)
+        except Exception:
+            logger.exception("Failed to load dataset '%s' from %s", name, version[0])
+            # Keep serving the last good copy rather than failing the request, and
+            # remember the failure so an unchanged file is not re-parsed every time
+            frame = entry["frame"] if entry is not None else pd.DataFrame()
+        _cache[key] = {"version": version, "frame": frame}
+        return frame
+
+
+def get_derived(name, builder):
+    """Return builder(frame) for the current version of a dataset.
+
+    The builder runs at most once per loaded version of the file, so indexes
+    and aggregates built from a dataset are refreshed together with it.
+    """
+    frame = get_dataset(name)
+    key = (name, builder.__module__, builder.__qualname__)
+
+    entry = _derived.get(key)
+    if entry is not None and entry["frame"] is frame:
+        return entry["value"]
+
+    with _derived_lock:
+        entry = _derived.get(key)
+        if entry is not None and entry["frame"] is frame:
+            return entry["value"]
+        value = builder(frame)
+        _derived[key] = {"frame": frame, "value": value}
+        return value
+
+
+def preload():
+    """Load every dataset into the cache (e.g. at worker startup)."""
+    for name in DATASETS:
+        get_dataset(name)
@@ -1,63 +1,85 @@
 import os
+import logging
 import requests
 import pandas as pd
 import random
-from datetime import datetime, timedelta
-from dotenv import load_dotenv
+import time
+from datetime import datetime
+import restaurant_cache
+from single_flight import SingleFlight
+from http_pool import http_get, fetch_all
+from instrumentation import count_cache, provider_call
+
+logger = logging.getLogger(__name__)
 
 # Google Places API Key 
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
+# Overridable so the fetcher can be pointed at a local stub server
+GOOGLE_PLACES_BASE_URL = os.getenv('GOOGLE_PLACES_BASE_URL', "https://maps.googleapis.com/maps/api/place")
+# Maximum number of Place Details requests in flight at once
+PLACES_CONCURRENCY = int(os.getenv('PLACES_CONCURRENCY', 10))
 
 # Constants
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # Base directory of the script
-DATA_FOLDER = os.path.join(BASE_DIR, "data")
-CACHE_FILE = os.path.join(DATA_FOLDER, "restaurant_and_wine_data.csv")
 CACHE_EXPIRY_HOURS = 12  # Set cache expiry to 12 hours
+# Serve an expired city while a single background refresh replaces it
+STALE_WHILE_REVALIDATE = os.getenv('RESTAURANT_CACHE_SWR', '1') == '1'
+# After a background refresh fails (or fetches nothing), the stale city is served
+# without trying again for this long, so an outage doesn't cost a call per page view
+RESTAURANT_REFRESH_BACKOFF_SECONDS = int(os.getenv('RESTAURANT_REFRESH_BACKOFF_SECONDS', 600))
 
-# Debugging: Print paths for confirmation
-print(f"Base directory of the script: {BASE_DIR}")
-print(f"Path to data folder: {DATA_FOLDER}")
-print(f"Path to cache file: {CACHE_FILE}")
-
-# Ensure the data folder exists
-if not os.path.exists(DATA_FOLDER):
-    print(f"Creating the data folder at {DATA_FOLDER}")
-    os.makedirs(DATA_FOLDER, exist_ok=True)  # Create the folder if it doesn't exist
+# Coalesces concurrent cache-miss fetches for the same city
+_fetches = SingleFlight()
+# Monotonic time of the last failed background refresh in this worker, keyed like _fetches
+_failed_refreshes = {}
 
 def search_restaurants(city, limit=50):
-    print(f"Searching for restaurants in {city}...")
-    url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+    logger.info("Searching for restaurants in %s", city)
+    url = f"{GOOGLE_PLACES_BASE_URL}/textsearch/json"
     params = {
         "query": f"restaurants in {city}",
         "key": GOOGLE_API_KEY
     }
-    response = requests.get(url, params=params)
+    try:
+        with provider_call("google_places"):
+            response = http_get(url, params=params)
+    except requests.RequestException as e:
+        logger.warning("Error fetching data: %s", e)
+        return []
     
     if response.status_code != 200:
-        print(f"Error fetching data: {response.status_code} - {response.text}")
+        logger.warning("Error fetching data: %s - %s", response.status_code, response.text)
         return []
 
     results = response.json().get("results", [])
-    print(f"Fetched {len(results)} results.")
-    
-    for place in results:
-        print(f"Name: {place['name']}")
-        print(f"Address: {place.get('formatted_address', 'N/A')}")
-        print(f"Place ID: {place['place_id']}")
-        print(f"Latitude: {place['geometry']['location']['lat']}")
-        print(f"Longitude: {place['geometry']['location']['lng']}")
-        print("---")
+    logger.info("Fetched %d results for %s.", len(results), city)
+
+    # One structured record per place, only built when debug logging is on
+    if logger.isEnabledFor(logging.DEBUG):
+        for place in results:
+            location = place.get('geometry', {}).get('location', {})
+            logger.debug("Place found", extra={
+                "place_name": place.get('name'),
+                "address": place.get('formatted_address', 'N/A'),
+                "place_id": place.get('place_id'),
+                "latitude": location.get('lat'),
+                "longitude": location.get('lng'),
+            })
     
     return results[:limit]
 
 def get_restaurant_details(place_id):
-    url = "https://maps.googleapis.com/maps/api/place/details/json"
+    url = f"{GOOGLE_PLACES_BASE_URL}/details/json"
     params = {
         "place_id": place_id,
         "fields": "name,formatted_address,geometry,opening_hours,photo",
         "key": GOOGLE_API_KEY
     }
-    response = requests.get(url, params=params)
+    try:
+        with provider_call("google_places"):
+            response = http_get(url, params=params)
+    except requests.RequestException as e:
+        logger.warning("Failed to fetch details for Place ID %s: %s", place_id, e)
+        return None
     
     if response.status_code == 200:
         data = response.json().get("result", {})
@@ -69,7 +91,7 @@ def get_restaurant_details(place_id):
             "photos": data.get("photos", [])
         }
     else:
-        print(f"Failed to fetch details for Place ID {place_id}: {response.status_code} - {response.text}")
+        logger.warning("Failed to fetch details for Place ID %s: %s - %s", place_id, response.status_code, response.text)
     return None
 
 def generate_wine_data():
@@ -86,48 +108,76 @@ def generate_wine_data():
 
 def load_cached_data(city):
     """Load cached data for a specific city if it exists and is recent enough."""
-    # Debug: Check if the cache file exists
-    if not os.path.exists(CACHE_FILE):
-        print(f"Cache file {CACHE_FILE} does not exist.")
-        return pd.DataFrame()  # No cache available
-
-    # Check if the CSV file contains the "Timestamp" column
-    cached_data = pd.read_csv(CACHE_FILE)
-    if "Timestamp" not in cached_data.columns:
-        print("No 'Timestamp' column found in the cached data.")
-        return pd.DataFrame()  # No valid cache if timestamp is missing
-    
-    # Parse 'Timestamp' column as datetime
-    cached_data["Timestamp"] = pd.to_datetime(cached_data["Timestamp"], errors='coerce')
-    
-    # Filter data for the specific city and check timestamp
-    city_data = cached_data[cached_data["City"] == city]
-    
+    # One partition per city, so this never reads other cities' rows
+    city_data = restaurant_cache.read_partition(city)
+
     if not city_data.empty:
         # Check if the data is recent enough (within CACHE_EXPIRY_HOURS)
-        latest_entry = city_data["Timestamp"].max()
-        if datetime.now() - latest_entry <= timedelta(hours=CACHE_EXPIRY_HOURS):
-            print(f"Loaded cached data for {city} from {latest_entry.date()}.")
+        if restaurant_cache.is_fresh(city_data, CACHE_EXPIRY_HOURS):
+            logger.debug("Loaded cached data for %s from %s.", city, city_data['Timestamp'].max().date())
             return city_data
-    
-    print(f"No valid cached data found for {city}, fetching new data.")
+
+    logger.debug("No valid cached data found for %s, fetching new data.", city)
     return pd.DataFrame()  # No valid cache for the city
 
+def _refresh_in_background(key, city, limit):
+    """Start a background refresh for a stale city unless one failed within the backoff window."""
+    failed_at = _failed_refreshes.get(key)
+    if failed_at is not None and time.monotonic() - failed_at < RESTAURANT_REFRESH_BACKOFF_SECONDS:
+        return False
+
+    def refresh():
+        try:
+            data = fetch_from_api(city, limit)
+        except Exception:
+            _failed_refreshes[key] = time.monotonic()
+            raise
+        if data.empty:
+            _failed_refreshes[key] = time.monotonic()
+        else:
+            _failed_refreshes.pop(key, None)
+        return data
+
+    return _fetches.do_in_background(key, refresh)
+
 def fetch_and_save_data(city, limit=50):
     # Step 1: Load cached data if available and recent
     cached_data = load_cached_data(city)
     if not cached_data.empty:
-        print(f"Using cached data for {city}.")
+        logger.debug("Using cached data for %s.", city)
+        count_cache("restaurants", "fresh")
         return cached_data
 
-    # Step 2: Fetch new data if no cache is available
+    key = f"restaurants:{restaurant_cache.normalize_city(city)}:{limit}"
+
+    # Step 1b: Serve the expired entry and let one background refresh replace it
+    if STALE_WHILE_REVALIDATE:
+        stale_data = restaurant_cache.read_partition(city)
+        if not stale_data.empty:
+            if _refresh_in_background(key, city, limit):
+                logger.info("Serving stale data for %s while it is refreshed.", city)
+            count_cache("restaurants", "stale")
+            return stale_data
+
+    # Step 2: Only one caller per city (across threads and workers) hits the API;
+    # the rest wait and reuse its result, or what another worker just cached
+    def recheck():
+        fresh_data = load_cached_data(city)
+        return None if fresh_data.empty else fresh_data
+
+    count_cache("restaurants", "miss")
+    return _fetches.do(key, lambda: fetch_from_api(city, limit), recheck=recheck)
+
+def fetch_from_api(city, limit=50):
+    """Fetch restaurants for a city from Google Places and save them to the city's cache partition."""
     restaurants = search_restaurants(city, limit=limit)
     data = []
-    
-    for restaurant in restaurants:
-        place_id = restaurant["place_id"]
-        details = get_restaurant_details(place_id)
-        
+
+    # Fetch all place details concurrently over the pooled session; results keep search order
+    place_ids = [restaurant["place_id"] for restaurant in restaurants]
+    all_details = fetch_all(get_restaurant_details, place_ids, max_workers=PLACES_CONCURRENCY)
+
+    for details in all_details:
         if details:
             wine_data = generate_wine_data()
             data.append({
@@ -144,22 +194,16 @@ def fetch_and_save_data(city, limit=50):
                 "Quantity Available": wine_data["Quantity Available"]
             })
     
-    # Step 3: Save to CSV if data was fetched
+    # Step 3: Save this city's partition if data was fetched
     if data:
         df = pd.DataFrame(data)
-        # Ensure the data folder exists before saving
-        if not os.path.exists(DATA_FOLDER):
-            print(f"Creating the data folder at {DATA_FOLDER}")
-            os.makedirs(DATA_FOLDER)
-
-        # Create or overwrite the cache file
         try:
-            df.to_csv(CACHE_FILE, index=False)
-            print(f"Data for {city} saved to {CACHE_FILE}.")
-        except Exception as e:
-            print(f"Failed to save data to {CACHE_FILE}: {e}")
+            restaurant_cache.write_partition(city, df)
+            logger.info("Data for %s saved to %s.", city, restaurant_cache.partition_path(city))
+        except Exception:
+            logger.exception("Failed to save data for %s", city)
     else:
-        print("No data fetched, so no new entries were added.")
+        logger.warning("No data fetched for %s, so no new entries were added.", city)
     
     return pd.DataFrame(data)  # Return the new data for immediate use
 
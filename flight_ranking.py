@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+
+# Criteria used for ranking; lower is better for all of them
+RANKING_CRITERIA = ("price", "duration_minutes", "stops")
+DEFAULT_WEIGHTS = {"price": 1.0, "duration_minutes": 0.5, "stops": 0.25}
+
+OFFER_COLUMNS = [
+    "offer_id", "origin", "destination", "price", "price_total", "currency", "duration", "duration_minutes",
+    "stops", "carrier", "cabin", "departure_time", "arrival_time",
+]
+
+
+def parse_iso_durations(durations):
+    """Convert ISO-8601 durations like 'PT28H20M' or 'P1DT2H' to minutes, vectorized."""
+    durations = pd.Series(durations, dtype=object)
+    parts = durations.str.extract(r'^P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?)?$').apply(pd.to_numeric)
+    # Anything that didn't parse becomes NaN rather than a zero-minute flight
+    unparsed = parts.isna().all(axis=1).to_numpy()
+    parts = parts.fillna(0)
+    minutes = np.array(parts[0] * 1440 + parts[1] * 60 + parts[2], dtype='float64')
+    minutes[unparsed] = np.nan
+    return minutes
+
+
+def flatten_offers(offers, origin=None, destination=None):
+    """Flatten Amadeus flight offers into one row per offer, in a single pass.
+
+    origin/destination are used when a segment doesn't carry an IATA code.
+    """
+    columns = {name: [] for name in OFFER_COLUMNS if name != "duration_minutes"}
+    for offer in offers:
+        itinerary = offer['itineraries'][0]
+        segments = itinerary['segments']
+        first_segment, last_segment = segments[0], segments[-1]
+        columns["offer_id"].append(offer.get('id'))
+        columns["origin"].append(first_segment['departure'].get('iataCode', origin))
+        columns["destination"].append(last_segment['arrival'].get('iataCode', destination))
+        columns["price_total"].append(offer['price']['total'])
+        columns["currency"].append(offer['price'].get('currency'))
+        columns["duration"].append(itinerary.get('duration'))
+        columns["stops"].append(len(segments) - 1)
+        columns["carrier"].append(first_segment['carrierCode'])
+        columns["cabin"].append(offer.get('travelerPricings', [{}])[0].get('fareDetailsBySegment', [{}])[0].get('cabin', "N/A"))
+        columns["departure_time"].append(first_segment['departure']['at'])
+        columns["arrival_time"].append(last_segment['arrival']['at'])
+
+    columns["price"] = pd.to_numeric(pd.Series(columns["price_total"], dtype=object), errors='coerce').to_numpy(dtype='float64')
+    columns["duration_minutes"] = parse_iso_durations(columns["duration"])
+    columns["stops"] = np.asarray(columns["stops"], dtype='int64')
+    return pd.DataFrame(columns, columns=OFFER_COLUMNS)
+
+
+def _group_keys(table, by):
+    # Integer group id per row (all zeros when ranking one batch)
+    if not by:
+        return np.zeros(len(table), dtype=np.intp)
+    return table.groupby(list(by), sort=False, dropna=False).ngroup().to_numpy()
+
+
+def score_offers(table, weights=None, by=None):
+    """Weighted score per offer in [0, 1] (lower is better).
+
+    Each criterion is min-max normalized within its group (e.g. per
+    origin/destination pair), so routes with very different fares can be
+    ranked in one batch. A missing or unparseable value counts as the worst
+    in its group, as it does in pareto_front.
+    """
+    weights = weights or DEFAULT_WEIGHTS
+    if table.empty:
+        return np.array([], dtype='float64')
+
+    groups = pd.Series(_group_keys(table, by))
+    total = np.zeros(len(table))
+    weight_sum = 0.0
+    for criterion, weight in weights.items():
+        if not weight:
+            continue
+        values = pd.Series(table[criterion].to_numpy(dtype='float64'))
+        low = values.groupby(groups).transform('min')
+        high = values.groupby(groups).transform('max')
+        span = (high - low).replace(0, np.nan)
+        # A group whose values are all equal normalizes to 0; a missing value to 1 (worst)
+        normalized = ((values - low) / span).fillna(0).where(values.notna(), 1.0).to_numpy()
+        total += weight * normalized
+        weight_sum += weight
+    return total / weight_sum if weight_sum else total
+
+
+def _pareto_group(values):
+    # Exact duplicates can't dominate each other, so work on the unique rows.
+    # np.unique sorts them lexicographically, so a dominating row always comes first
+    unique, inverse = np.unique(values, axis=0, return_inverse=True)
+    second, third = unique[:, 1], unique[:, 2]
+    dominated = np.zeros(len(unique), dtype=bool)
+    # For every level of the last criterion, a running minimum of the second one
+    # over earlier rows that are no worse on the last criterion finds dominating rows.
+    # O(n log n + n * levels) instead of comparing every pair
+    for level in np.unique(third):
+        eligible = third <= level
+        best_before = np.r_[np.inf, np.minimum.accumulate(np.where(eligible, second, np.inf))[:-1]]
+        # Missing values are inf, so only count rows that actually have an eligible row before them
+        has_before = np.r_[0, np.cumsum(eligible)[:-1]] > 0
+        at_level = third == level
+        dominated[at_level] = (has_before & (best_before <= second))[at_level]
+    return ~dominated[inverse.ravel()]
+
+
+def pareto_front(table, criteria=RANKING_CRITERIA, by=None):
+    """Boolean mask of offers not dominated by another offer in the same group.
+
+    An offer is dominated when some other offer is no worse on every criterion
+    and strictly better on at least one. Expects three criteria, the last with
+    few distinct values (like stops).
+    """
+    values = np.array(table[list(criteria)].to_numpy(dtype='float64'))
+    values[np.isnan(values)] = np.inf
+    groups = _group_keys(table, by)
+    on_front = np.ones(len(table), dtype=bool)
+    if not len(table):
+        return on_front
+
+    order = np.argsort(groups, kind='stable')
+    bounds = np.flatnonzero(np.diff(groups[order])) + 1
+    for members in np.split(order, bounds):
+        on_front[members] = _pareto_group(values[members])
+    return on_front
+
+
+def top_k(scores, k, groups=None):
+    """Positions of the k lowest scores (per group if groups is given), best first."""
+    scores = np.asarray(scores, dtype='float64')
+    if groups is None:
+        if k < len(scores):
+            candidates = np.argpartition(scores, k)[:k]
+        else:
+            candidates = np.arange(len(scores))
+        return candidates[np.argsort(scores[candidates], kind='stable')]
+
+    # Sort by (group, score) once and keep the first k of every group
+    order = np.lexsort((scores, groups))
+    sorted_groups = groups[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_groups)) + 1]
+    rank_in_group = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    return order[rank_in_group < k]
+
+
+def rank_offers(table, weights=None, k=None, by=None, pareto_only=False):
+    """Score, optionally Pareto-filter, and return the best offers (per group when `by` is set)."""
+    if table.empty:
+        return table.assign(score=pd.Series(dtype='float64'), pareto=pd.Series(dtype=bool))
+
+    ranked = table.assign(score=score_offers(table, weights, by=by), pareto=pareto_front(table, by=by))
+    if pareto_only:
+        ranked = ranked[ranked["pareto"]]
+
+    scores = ranked["score"].to_numpy()
+    groups = _group_keys(ranked, by) if by else None
+    positions = top_k(scores, k if k is not None else len(ranked), groups=groups)
+    return ranked.iloc[positions].reset_index(drop=True)
+
+
+def rank_routes(offers_by_route, weights=None, k=5, pareto_only=False):
+    """Rank offers for many (origin, destination) pairs in one batch.
+
+    offers_by_route maps (origin, destination) to a list of Amadeus offers.
+    Returns the top k offers of every route with their scores.
+    """
+    tables = [flatten_offers(offers, origin, destination) for (origin, destination), offers in offers_by_route.items() if offers]
+    if not tables:
+        return flatten_offers([])
+    table = pd.concat(tables, ignore_index=True)
+    return rank_offers(table, weights=weights, k=k, by=("origin", "destination"), pareto_only=pareto_only)
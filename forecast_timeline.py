@@ -0,0 +1,99 @@
+import time
+import threading
+import numpy as np
+import pandas as pd
+
+# Format of arrival times in Amadeus offers (local time at the airport, no offset)
+ARRIVAL_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def _mktime(arrival_time):
+    try:
+        return int(time.mktime(time.strptime(arrival_time, ARRIVAL_TIME_FORMAT)))
+    except (TypeError, ValueError, OverflowError):
+        return -1
+
+
+def to_timestamps(arrival_times, tz=None):
+    """Convert arrival time strings to unix timestamps, vectorized.
+
+    Times are wall-clock times in `tz`, an IANA zone name such as the arrival
+    airport's. In the hour repeated when clocks go back the first (DST) reading
+    is used, and a time skipped when clocks go forward moves to the end of the
+    gap. Without `tz` each distinct time is read as server local time with
+    time.mktime. Unparseable times come back as -1.
+    """
+    arrival_times = pd.Series(arrival_times, dtype=object)
+    if tz is None:
+        return arrival_times.map({value: _mktime(value) for value in arrival_times.unique()}).to_numpy(dtype='int64')
+
+    parsed = pd.to_datetime(arrival_times, format=ARRIVAL_TIME_FORMAT, errors='coerce')
+    local = parsed.dt.tz_localize(tz, ambiguous=np.ones(len(parsed), dtype=bool), nonexistent='shift_forward')
+    seconds = (local - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+    return seconds.fillna(-1).to_numpy(dtype='int64')
+
+
+def weather_row(forecast):
+    return {
+        "Time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(forecast['dt'])),
+        "Temperature (C)": forecast['main']['temp'],
+        "Max Temperature (C)": forecast['main']['temp_max'],
+        "Min Temperature (C)": forecast['main']['temp_min'],
+        "Humidity (%)": forecast['main']['humidity'],
+        "Weather": forecast['weather'][0]['description'],
+        "Wind Speed (m/s)": forecast['wind']['speed'],
+        "Wind Direction": forecast['wind'].get('deg', 'N/A'),
+        "Cloudiness (%)": forecast['clouds']['all']
+    }
+
+
+class ForecastTimeline:
+    """Forecast slots sorted by time, for nearest-slot lookups with searchsorted.
+
+    Rows are formatted once when the timeline is built, so a lookup is a
+    binary search and an index, however many arrival times are asked for.
+    """
+
+    def __init__(self, forecasts):
+        forecasts = sorted(forecasts, key=lambda forecast: forecast['dt'])
+        self.timestamps = np.array([forecast['dt'] for forecast in forecasts], dtype='int64')
+        self.rows = [weather_row(forecast) for forecast in forecasts]
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def nearest(self, timestamps):
+        """Index of the closest slot for every timestamp (-1 where there is none)."""
+        timestamps = np.asarray(timestamps, dtype='int64')
+        if not len(self.timestamps):
+            return np.full(len(timestamps), -1, dtype=np.intp)
+
+        right = np.searchsorted(self.timestamps, timestamps).clip(max=len(self.timestamps) - 1)
+        left = (right - 1).clip(min=0)
+        # On a tie the earlier slot wins, as in the old linear scan
+        take_left = np.abs(timestamps - self.timestamps[left]) <= np.abs(self.timestamps[right] - timestamps)
+        index = np.where(take_left, left, right)
+        return np.where(timestamps >= 0, index, -1)
+
+    def lookup(self, arrival_times, tz=None):
+        """Weather row for every arrival time string (local time in `tz`, see to_timestamps), in order."""
+        return [
+            dict(self.rows[i]) if i >= 0 else {"Time": arrival_time, "Weather": "No data"}
+            for arrival_time, i in zip(arrival_times, self.nearest(to_timestamps(arrival_times, tz)))
+        ]
+
+
+# Timeline per city, rebuilt only when the cached forecast list changes
+_timelines = {}
+_lock = threading.Lock()
+
+
+def get_timeline(city, forecasts):
+    """Timeline for a city's forecast, reused while the same forecast list is served from cache."""
+    entry = _timelines.get(city)
+    if entry is not None and entry[0] is forecasts:
+        return entry[1]
+    timeline = ForecastTimeline(forecasts)
+    with _lock:
+        _timelines[city] = (forecasts, timeline)
+    return timeline
@@ -0,0 +1,30 @@
+import os
+import time
+
+# Import the app once in the master; workers are forked from it instead of importing it
+# themselves, so a new worker is serving within milliseconds
+preload_app = True
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+# Worker heartbeats on tmpfs, so a slow disk can't stall boot or trip the timeout
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+# Load the datasets in the master too, so workers share them copy-on-write (0 = load lazily per worker)
+PRELOAD_DATASETS = os.getenv('PRELOAD_DATASETS', '1') == '1'
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before the first worker is forked
+    if not PRELOAD_DATASETS:
+        return
+    from app import warm
+
+    started = time.perf_counter()
+    warm()
+    server.log.info("Datasets loaded in %.2fs", time.perf_counter() - started)
+
+
+def post_fork(server, worker):
+    # Each worker reports only its own requests, not the master's preload
+    from instrumentation import metrics
+
+    metrics.clear()
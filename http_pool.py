@@ -0,0 +1,62 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared HTTP settings for calls to external providers
+HTTP_TIMEOUT_SECONDS = float(os.getenv('HTTP_TIMEOUT_SECONDS', 10))
+HTTP_CONCURRENCY = int(os.getenv('HTTP_CONCURRENCY', 10))
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', 3))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide pooled session.
+
+    Connections are kept alive and reused across calls and threads, and GETs
+    are retried with exponential backoff on 429/5xx (honouring Retry-After).
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=HTTP_RETRIES,
+                    backoff_factor=0.5,
+                    status_forcelist=RETRY_STATUSES,
+                    allowed_methods=["GET"],
+                    respect_retry_after_header=True,
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(pool_connections=10, pool_maxsize=max(HTTP_CONCURRENCY, 10), max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def http_get(url, params=None, timeout=None):
+    """GET through the shared session with a per-call timeout."""
+    return get_session().get(url, params=params, timeout=timeout or HTTP_TIMEOUT_SECONDS)
+
+
+def fetch_all(func, items, max_workers=None):
+    """Call func(item) for every item on a bounded thread pool.
+
+    Results come back in the same order as the items. func should handle its
+    own errors; an exception raised by func propagates to the caller.
+    """
+    items = list(items)
+    if not items:
+        return []
+    workers = min(max_workers or HTTP_CONCURRENCY, len(items))
+    if workers <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, items))
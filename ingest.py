@@ -0,0 +1,289 @@
+"""Offline ingest: turn (large) dataset CSVs into the typed columnar files the web app reads.
+
+Each CSV is split into byte ranges of whole records and parsed in a process
+pool. Workers fill in the derived columns, apply the declared dtypes, write
+their chunk to a part file and return the chunk's dashboard aggregates in
+mergeable form. The parts are then streamed into one Feather file with
+unified categories, and the merged aggregates are stored as the dashboard
+snapshot, so no worker parses the CSV or recomputes the snapshot. Peak memory
+follows the chunk size and worker count, not the file size.
+
+    python ingest.py                                   # every dataset in data/
+    python ingest.py auction --source auction=/exports/auction_2024.csv --workers 8
+"""
+import os
+import io
+import shutil
+import argparse
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from atomic_file import atomic_path
+from data_store import DATASETS, COLUMNAR_FOLDER, dataset_path, columnar_path, apply_dtypes, get_dataset
+import dashboard
+
+try:
+    import pyarrow as pa
+    from pyarrow import feather
+except ImportError:
+    pa = feather = None
+
+# CSV bytes parsed per task; a worker holds roughly a few times this in memory
+INGEST_CHUNK_BYTES = int(os.getenv('INGEST_CHUNK_BYTES', 32 * 1024 * 1024))
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', os.cpu_count() or 1))
+
+# Derived auction columns, as found in auction_data.csv
+RANDS_PER_DOLLAR = 18.46
+# (upper bound, flag, category); bins are closed on the right, as in the exports
+PRICE_BANDS = [(500, "R0-R500", "Cheap"), (1000, "R500-R1000", "Affordable"), (1500, "R1000-R1500", "Moderate"), (2000, "R1500-R2000", "Expensive")]
+TASTE_BANDS = [(80, "60-80", "Standard"), (90, "80-90", "Premium"), (100, "90-100", "Exceptional")]
+PRICE_FLOOR, TASTE_FLOOR = 0, 60
+# Participation flag prefix -> the auction column that is only set for participants
+PARTICIPATION = {
+    "auction_restaurant": "auction_restaurant_id",
+    "auction_wine": "auction_wine_name",
+    "auction_company": "auction_company_name",
+}
+PARTICIPATION_LABELS = ["no participation", "participated"]
+
+
+def _banded(values, floor, bands):
+    flags = pd.cut(values, [floor] + [upper for upper, _, _ in bands], labels=[flag for _, flag, _ in bands])
+    return flags, flags.map(dict((flag, category) for _, flag, category in bands))
+
+
+def derive_auction(frame):
+    """Fill in the derived auction columns (rand prices, bands and participation flags) from the raw export."""
+    # Half-cents round up, as in the exports (round() would send 1269.125 to 1269.12)
+    cents = (pd.to_numeric(frame["Wine_Price"], errors='coerce') * RANDS_PER_DOLLAR * 100).round(6)
+    frame["wine_price_rands"] = np.floor(cents + 0.5) / 100
+    location = frame["Location"].astype("string").str.rsplit(",", n=1)
+    frame["city"] = location.str[0].str.strip()
+    frame["country"] = location.str[-1].str.strip()
+
+    price_flag, price_category = _banded(frame["wine_price_rands"], PRICE_FLOOR, PRICE_BANDS)
+    taste_flag, taste_category = _banded(pd.to_numeric(frame["Tasting_Score"], errors='coerce'), TASTE_FLOOR, TASTE_BANDS)
+    frame["wine_price_rands_flag"] = price_flag
+    frame["taste_score_flag"] = taste_flag
+    for prefix, source in PARTICIPATION.items():
+        frame[f"{prefix}_flag"] = frame[source].notna().astype('int8')
+    frame["wine_price_category"] = price_category
+    frame["taste_category"] = taste_category
+    for prefix in PARTICIPATION:
+        frame[f"{prefix}_category"] = pd.Categorical.from_codes(frame[f"{prefix}_flag"], PARTICIPATION_LABELS)
+    if "demand_flag" in frame.columns:
+        # Comes with the export; kept last, where the app's copy has it
+        frame["demand_flag"] = frame.pop("demand_flag")
+    return frame
+
+
+DERIVERS = {"auction": derive_auction}
+
+
+def record_ranges(path, chunk_bytes=INGEST_CHUNK_BYTES):
+    """Return the header line and (start, end) byte ranges of whole records after it.
+
+    A newline only ends a record outside quotes, i.e. after an even number of
+    quote characters (escaped quotes come in pairs), so quoted fields with
+    line breaks never straddle two ranges.
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        ranges = []
+        start = f.tell()
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            cut = _last_record_end(block)
+            # A single record longer than a chunk: keep reading until it ends
+            while cut is None:
+                more = f.read(chunk_bytes)
+                if not more:
+                    cut = len(block)
+                    break
+                block += more
+                cut = _last_record_end(block)
+            ranges.append((start, start + cut))
+            start += cut
+            f.seek(start)
+        return header, ranges
+
+
+def _last_record_end(block):
+    quotes = block.count(b'"')
+    newline = block.rfind(b'\n')
+    while newline >= 0:
+        # Quotes before this newline = all quotes minus the (few) after it
+        if (quotes - block.count(b'"', newline)) % 2 == 0:
+            return newline + 1
+        newline = block.rfind(b'\n', 0, newline)
+    return None
+
+
+def parse_chunk(name, path, header, start, end, part_path):
+    """Parse one byte range of a dataset CSV into a typed part file; return its summary for the reduce step."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    frame = pd.read_csv(io.BytesIO(header + data))
+    if name in DERIVERS:
+        frame = DERIVERS[name](frame)
+    frame = apply_dtypes(name, frame).reset_index(drop=True)
+    if len(frame):
+        frame.to_feather(part_path)
+    return {
+        "part": part_path if len(frame) else None,
+        "rows": len(frame),
+        "dtypes": {col: (str(dtype) if frame[col].notna().any() else None) for col, dtype in frame.dtypes.items()},
+        "categories": {col: list(frame[col].cat.categories) for col in frame.columns if isinstance(frame[col].dtype, pd.CategoricalDtype)},
+        "partial": dashboard.snapshot_partial(name, frame) if name in dashboard.SNAPSHOT_DATASETS else {},
+    }
+
+
+def _resolve_dtypes(summaries):
+    # One dtype per column across all parts: shared categories for categoricals,
+    # float for int/float mixes and object for anything else that disagrees
+    columns = {}
+    for summary in summaries:
+        for col, dtype in summary["dtypes"].items():
+            columns.setdefault(col, [])
+            if dtype is not None:
+                columns[col].append(dtype)
+
+    resolved = {}
+    for col, dtypes in columns.items():
+        category_lists = [summary["categories"][col] for summary in summaries if col in summary["categories"]]
+        if category_lists:
+            first = category_lists[0]
+            if all(categories == first for categories in category_lists):
+                categories = first
+            else:
+                categories = sorted({value for categories in category_lists for value in categories}, key=str)
+            resolved[col] = pd.CategoricalDtype(categories)
+        elif not dtypes or len(set(dtypes)) == 1:
+            resolved[col] = dtypes[0] if dtypes else 'float64'
+        elif all(dtype.startswith(("int", "float")) for dtype in dtypes):
+            resolved[col] = 'float64'
+        else:
+            resolved[col] = 'object'
+    return resolved
+
+
+def _write_columnar(parts, dtypes, target):
+    # Parts are appended one at a time, so memory stays bounded by the largest part.
+    # Renamed into place, so workers never map a half-written file
+    schema = None
+    with atomic_path(target) as tmp_path, pa.OSFile(tmp_path, 'wb') as sink:
+        writer = None
+        for part in parts:
+            frame = pd.read_feather(part)
+            frame = frame.astype({col: dtype for col, dtype in dtypes.items() if col in frame.columns})
+            frame = frame[list(dtypes)]
+            table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                writer = pa.ipc.new_file(sink, schema)
+            writer.write_table(table)
+        writer.close()
+
+
+def _run_tasks(tasks, workers):
+    # Results come back in submission order; at most 2 tasks per worker are in flight
+    if workers <= 1:
+        for task in tasks:
+            yield parse_chunk(*task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(parse_chunk, *task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def convert_to_columnar(name, source=None, workers=INGEST_WORKERS, chunk_bytes=INGEST_CHUNK_BYTES):
+    """Ingest one dataset CSV into its typed Feather file and return the merged dashboard partial.
+
+    Low-cardinality strings are stored as categoricals and 0/1 flags as int8
+    (see DATASETS in data_store.py). The file is written uncompressed so
+    readers can memory-map it instead of decoding it.
+    """
+    csv_path = source or dataset_path(name)
+    if not os.path.exists(csv_path):
+        print(f"Skipping '{name}': {csv_path} does not exist.")
+        return None
+
+    header, ranges = record_ranges(csv_path, chunk_bytes)
+    os.makedirs(COLUMNAR_FOLDER, exist_ok=True)
+    part_folder = tempfile.mkdtemp(prefix=f".{name}-parts-", dir=COLUMNAR_FOLDER)
+    try:
+        tasks = [(name, csv_path, header, start, end, os.path.join(part_folder, f"{i:06d}.feather")) for i, (start, end) in enumerate(ranges)]
+        summaries, partial = [], {}
+        for summary in _run_tasks(tasks, workers):
+            # Merged as results arrive, so only one partial per dataset is kept
+            partial = dashboard.merge_partials(partial, summary.pop("partial"))
+            summaries.append(summary)
+
+        target = columnar_path(name)
+        parts = [summary["part"] for summary in summaries if summary["part"]]
+        if not parts:
+            # Nothing to write (e.g. a header-only export); an empty file would
+            # shadow the CSV, so the current columnar copy is left untouched
+            print(f"Skipping '{name}': {csv_path} has no rows; keeping {target} as it is.")
+            return None
+        _write_columnar(parts, _resolve_dtypes(summaries), target)
+    finally:
+        shutil.rmtree(part_folder, ignore_errors=True)
+
+    rows = sum(summary["rows"] for summary in summaries)
+    print(f"Converted '{name}': {rows} rows in {len(ranges)} chunks, {os.path.getsize(csv_path)} -> {os.path.getsize(target)} bytes ({target})")
+    return partial
+
+
+def publish_dashboard_snapshot(partials):
+    """Store the dashboard snapshot from the ingested partials; datasets not ingested are read as usual."""
+    for name in dashboard.SNAPSHOT_DATASETS:
+        if partials.get(name) is None:
+            partials[name] = dashboard.snapshot_partial(name, get_dataset(name, columns=dashboard.SNAPSHOT_COLUMNS[name]))
+    path = dashboard.persist_snapshot(dashboard.finalize_snapshot(partials))
+    print(f"Dashboard snapshot written to {path}")
+
+
+def _source(value):
+    name, _, path = value.partition("=")
+    if not path:
+        raise argparse.ArgumentTypeError("expected NAME=PATH")
+    return name, path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert the CSV datasets in data/ to typed columnar files.")
+    parser.add_argument("datasets", nargs="*", help=f"Datasets to convert: {', '.join(DATASETS)} (default: all)")
+    parser.add_argument("--source", type=_source, action="append", default=[], metavar="NAME=PATH",
+                        help="Read a dataset from another CSV, e.g. a new export (repeatable)")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="Parser processes (default: one per core)")
+    parser.add_argument("--chunk-mb", type=float, default=INGEST_CHUNK_BYTES / (1024 * 1024), help="CSV megabytes per task")
+    args = parser.parse_args(argv)
+
+    sources = dict(args.source)
+    unknown = [name for name in list(args.datasets) + list(sources) if name not in DATASETS]
+    if unknown:
+        parser.error(f"unknown dataset(s): {', '.join(unknown)}")
+
+    if feather is None:
+        parser.error("pyarrow is required to write columnar files (pip install pyarrow)")
+
+    chunk_bytes = max(int(args.chunk_mb * 1024 * 1024), 1)
+    partials = {}
+    for name in args.datasets or DATASETS:
+        partials[name] = convert_to_columnar(name, source=sources.get(name), workers=args.workers, chunk_bytes=chunk_bytes)
+    publish_dashboard_snapshot(partials)
+
+
+if __name__ == "__main__":
+    main()
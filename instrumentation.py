@@ -0,0 +1,275 @@
+import io
+import os
+import sys
+import json
+import time
+import pstats
+import logging
+import cProfile
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from flask import Response, g, has_request_context, request
+
+# Logging: LOG_LEVEL picks the level, LOG_FORMAT=json switches to one JSON object per line
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+# ?profile=1 or an X-Profile: 1 header returns a cProfile report instead of the page, only when enabled.
+# One profiled request per worker at a time (others get a 409); on Python 3.12+ the profiler also
+# sees the worker's other threads, so profile with GUNICORN_THREADS=1 for a clean report
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '0') == '1'
+PROFILE_LINES = int(os.getenv('PROFILE_LINES', 40))
+
+# Prometheus' default latency buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+HELP = {
+    "http_requests_total": "HTTP requests served, by endpoint and status.",
+    "http_request_duration_seconds": "Time to handle an HTTP request.",
+    "span_duration_seconds": "Time spent in instrumented code paths (CSV loads, filtering, rendering, provider calls).",
+    "cache_requests_total": "Cache lookups by cache and result.",
+    "provider_calls_total": "Calls to external providers by provider and outcome.",
+    "ttl_cache_events_total": "TTL cache hits, misses and evictions by cached function.",
+    "ttl_cache_entries": "Entries currently held by each TTL cache.",
+}
+
+# Standard LogRecord attributes; anything else on a record came from `extra=`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=None, fmt=None):
+    """Send the app's logs to stderr at LOG_LEVEL, as text or JSON lines. Safe to call more than once."""
+    root = logging.getLogger()
+    if getattr(root, "_wine_platform_configured", False):
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    if (fmt or LOG_FORMAT) == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root.addHandler(handler)
+    root.setLevel(level or LOG_LEVEL)
+    root._wine_platform_configured = True
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Metrics:
+    """In-process counters and histograms, rendered in the Prometheus text format.
+
+    Each worker keeps its own numbers; scrape every worker (or sum them) for totals.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = _Histogram()
+            histogram.observe(value)
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+metrics = Metrics()
+
+
+def inc(name, value=1, **labels):
+    metrics.inc(name, value, **labels)
+
+
+def count_cache(cache, result):
+    """Count a cache lookup, e.g. count_cache("restaurant_partition", "hit")."""
+    metrics.inc("cache_requests_total", cache=cache, result=result)
+
+
+@contextmanager
+def span(name, **labels):
+    """Time a block into span_duration_seconds and the current request's Server-Timing header."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.observe("span_duration_seconds", elapsed, span=name, **labels)
+        if has_request_context():
+            spans = g.setdefault("spans", [])
+            spans.append((name, elapsed))
+
+
+def timed(name, **labels):
+    """Decorator form of span()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def provider_call(provider):
+    """Span and outcome counter around one external provider call."""
+    outcome = "error"
+    try:
+        with span("provider_call", provider=provider):
+            yield
+        outcome = "ok"
+    finally:
+        metrics.inc("provider_calls_total", provider=provider, outcome=outcome)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def render_metrics():
+    """All metrics (plus TTL cache stats) in the Prometheus text exposition format."""
+    from ttl_cache import cache_stats
+
+    lines = []
+    with metrics.lock:
+        counters = dict(metrics.counters)
+        histograms = {key: (list(h.counts), h.total, h.count) for key, h in metrics.histograms.items()}
+
+    for name, stats in cache_stats().items():
+        for event in ("hits", "misses", "evictions"):
+            counters[("ttl_cache_events_total", (("cache", name), ("event", event)))] = stats[event]
+    gauges = {("ttl_cache_entries", (("cache", name),)): stats["size"] for name, stats in cache_stats().items()}
+
+    seen = set()
+
+    def header(name, kind):
+        if name not in seen:
+            seen.add(name)
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{name}{_labels(labels)} {value}")
+    for (name, labels), value in sorted(gauges.items()):
+        header(name, "gauge")
+        lines.append(f"{name}{_labels(labels)} {value}")
+    for (name, labels), (counts, total, count) in sorted(histograms.items()):
+        header(name, "histogram")
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS + ("+Inf",), counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {total}")
+        lines.append(f"{name}_count{_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+# Held while a request in this process is being profiled
+_profile_lock = threading.Lock()
+
+
+def _profiling_requested():
+    return PROFILING_ENABLED and (request.args.get("profile") == "1" or request.headers.get("X-Profile") == "1")
+
+
+def init_app(app):
+    """Time every request, time template rendering, serve /metrics and handle ?profile=1."""
+    base_template = app.jinja_env.template_class
+
+    class TimedTemplate(base_template):
+        def render(self, *args, **kwargs):
+            with span("render_template", template=self.name):
+                return super().render(*args, **kwargs)
+
+    app.jinja_env.template_class = TimedTemplate
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+        if _profiling_requested():
+            if not _profile_lock.acquire(blocking=False):
+                return Response("Another request is being profiled by this worker, try again shortly.\n", status=409, mimetype="text/plain")
+            g.profiling = True
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def record_request(response):
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(PROFILE_LINES)
+            response = Response(report.getvalue(), mimetype="text/plain")
+
+        started = g.pop("request_started", None)
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            metrics.inc("http_requests_total", method=request.method, endpoint=endpoint, status=response.status_code)
+            metrics.observe("http_request_duration_seconds", elapsed, method=request.method, endpoint=endpoint)
+            timings = [f"total;dur={elapsed * 1000:.1f}"]
+            timings += [f"{name.replace(' ', '_')};dur={seconds * 1000:.1f}" for name, seconds in g.get("spans", [])]
+            response.headers["Server-Timing"] = ", ".join(timings)
+        return response
+
+    @app.teardown_request
+    def stop_profiler(error=None):
+        # Runs even when the request failed before after_request
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+        if g.pop("profiling", False):
+            _profile_lock.release()
+
+    @app.route("/metrics")
+    def prometheus_metrics():
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -1,112 +1,177 @@
-import time
+import logging
 import requests
-from functools import lru_cache
 import pandas as pd
 import os
-from amadeus import Client, ResponseError
-from dotenv import load_dotenv
-
-# Initialize Amadeus client
-amadeus = Client(client_id= os.getenv('AMADEUS_CLIENT_ID'), client_secret=os.getenv('AMADEUS_CLIENT_SECRET'))
+import threading
+from rate_limit import rate_limit
+from ttl_cache import ttl_cache
+from http_pool import http_get
+from flight_ranking import rank_offers
+from forecast_timeline import get_timeline
+from instrumentation import provider_call
+
+logger = logging.getLogger(__name__)
+
+# Amadeus client, built on first use by get_amadeus() so importing this module stays cheap
+amadeus = None
+_amadeus_lock = threading.Lock()
 OPENWEATHERMAP_API_KEY = os.getenv('OPENWEATHERMAP_API_KEY')
 TOMTOM_API_KEY = os.getenv('TOMTOM_API_KEY')
-
-@lru_cache(maxsize=1)  # Cache the results for this function
-def get_all_flights():
+# Point at a local mock routing server for testing
+TOMTOM_BASE_URL = os.getenv('TOMTOM_BASE_URL', 'https://api.tomtom.com').rstrip('/')
+
+# Route shown on the logistics page
+DEFAULT_ORIGIN = "CPT"
+DEFAULT_DESTINATION = "LAX"
+DEFAULT_DEPARTURE_DATE = "2024-12-01"
+DEFAULT_WEATHER_CITY = "Los Angeles,US"
+LAX_COORDINATES = (33.9416, -118.4085)
+WINE_FARM_COORDINATES = (34.5889, -120.0382)  # Example wine farm coordinates
+# Amadeus gives arrival times in the airport's local time, without an offset
+AIRPORT_TIMEZONES = {"CPT": "Africa/Johannesburg", "LAX": "America/Los_Angeles"}
+ARRIVAL_TIMEZONE = os.getenv('ARRIVAL_TIMEZONE', AIRPORT_TIMEZONES.get(DEFAULT_DESTINATION))
+
+# How long provider responses are reused, per provider
+FLIGHTS_TTL_SECONDS = int(os.getenv('FLIGHTS_TTL_SECONDS', 5400))  # 1.5 hours
+WEATHER_TTL_SECONDS = int(os.getenv('WEATHER_TTL_SECONDS', 1800))
+TRAFFIC_TTL_SECONDS = int(os.getenv('TRAFFIC_TTL_SECONDS', 300))
+
+# Ranked alternatives shown next to the best flight
+RANKED_FLIGHTS = int(os.getenv('RANKED_FLIGHTS', 5))
+RANKED_COLUMNS = [
+    "carrier", "price_total", "currency", "duration", "stops", "cabin", "departure_time", "arrival_time",
+    "arrival_temperature", "arrival_weather", "score", "pareto",
+]
+
+def get_amadeus():
+    """Return the shared Amadeus client, creating it on first use."""
+    global amadeus
+    if amadeus is None:
+        with _amadeus_lock:
+            if amadeus is None:
+                from amadeus import Client
+                amadeus = Client(client_id=os.getenv('AMADEUS_CLIENT_ID'), client_secret=os.getenv('AMADEUS_CLIENT_SECRET'))
+    return amadeus
+
+# Responses are cached per route/date/city, shared between workers through
+# disk and kept across restarts; empty (failed) responses are not cached
+@ttl_cache(ttl=FLIGHTS_TTL_SECONDS, maxsize=64, persist=True, cache_if=bool)
+def get_all_flights(origin=DEFAULT_ORIGIN, destination=DEFAULT_DESTINATION, departure_date=DEFAULT_DEPARTURE_DATE, adults=1, currency="ZAR"):
+    if not rate_limit("amadeus"):
+        return []
     try:
-        response = amadeus.shopping.flight_offers_search.get(
-            originLocationCode="CPT",
-            destinationLocationCode="LAX",
-            departureDate="2024-12-01",
-            adults=1,
-            currencyCode="ZAR"
-        )
+        with provider_call("amadeus"):
+            response = get_amadeus().shopping.flight_offers_search.get(
+                originLocationCode=origin,
+                destinationLocationCode=destination,
+                departureDate=departure_date,
+                adults=adults,
+                currencyCode=currency
+            )
         flights = response.data
         return flights
     except Exception as e:
-        print(f"An error occurred while fetching flights: {e}")
+        logger.warning("An error occurred while fetching flights: %s", e)
         return []
 
-def find_best_flight(flights):
+def find_best_flight(offers, origin=DEFAULT_ORIGIN, destination=DEFAULT_DESTINATION):
+    """The cheapest offer of a flattened offer table (see flight_ranking.flatten_offers).
+
+    Offers without a parseable price are never picked, as in the ranking.
+    """
+    priced = offers['price'].dropna()
+    if priced.empty:
+        logger.info("No flight offer has a price.")
+        return None
     try:
-        best_flight = min(flights, key=lambda x: float(x['price']['total']))
-        first_segment = best_flight['itineraries'][0]['segments'][0]
-        last_segment = best_flight['itineraries'][0]['segments'][-1]
+        best_flight = offers.loc[priced.idxmin()]
         return {
-            "Flight Price": best_flight['price']['total'],
-            "Flight Duration": best_flight['itineraries'][0]['duration'],
-            "Departure Time": first_segment['departure']['at'],
-            "Arrival Time": last_segment['arrival']['at'],
-            "Airline": first_segment['carrierCode'],
-            "Stops": len(best_flight['itineraries'][0]['segments']) - 1,
-            "Cabin Class": best_flight.get('travelerPricings', [{}])[0].get('fareDetailsBySegment', [{}])[0].get('cabin', "N/A"),
-            "Origin": "CPT",
-            "Destination": "LAX"
+            "Flight Price": best_flight['price_total'],
+            "Flight Duration": best_flight['duration'],
+            "Departure Time": best_flight['departure_time'],
+            "Arrival Time": best_flight['arrival_time'],
+            "Airline": best_flight['carrier'],
+            "Stops": int(best_flight['stops']),
+            "Cabin Class": best_flight['cabin'],
+            "Origin": origin,
+            "Destination": destination
         }
     except Exception as e:
-        print(f"An error occurred while selecting the best flight: {e}")
+        logger.warning("An error occurred while selecting the best flight: %s", e)
         return None
 
+def rank_flights(offers, weights=None, k=RANKED_FLIGHTS):
+    """Top k offers of a flattened offer table by weighted price/duration/stops score, as records.
+
+    `pareto` marks offers no other offer beats on price, duration and stops at
+    once; each offer also carries the forecast at its arrival time.
+    """
+    ranked = add_arrival_weather(rank_offers(offers, weights=weights, k=k))
+    ranked = ranked.assign(score=ranked["score"].round(3), stops=ranked["stops"].astype(int))[RANKED_COLUMNS]
+    # Missing forecasts become null rather than NaN in the published JSON
+    return ranked.astype(object).where(ranked.notna(), None).to_dict(orient="records")
+
 # Function with rate-limiting for fetching flight data every 1.5 hours
-def fetch_flight_data_with_rate_limit():
-    flights = get_all_flights()  # Fetch flights, using the cached data if available
-    
-    # Sleep for 1.5 hours (5400 seconds) to prevent excessive API calls
-    #time.sleep(5400)  # Rate-limiting interval
-    time.sleep(2)  # Rate-limiting interval
-  
-    return flights
-
-@lru_cache(maxsize=1)  # Cache the results for this function
-def get_weather_at_arrival(arrival_time):
+def fetch_flight_data_with_rate_limit(origin=DEFAULT_ORIGIN, destination=DEFAULT_DESTINATION, departure_date=DEFAULT_DEPARTURE_DATE):
+    # Responses are cached for FLIGHTS_TTL_SECONDS and Amadeus calls go
+    # through the provider's token bucket, so there is no need to sleep here
+    return get_all_flights(origin, destination, departure_date)
+
+@ttl_cache(ttl=WEATHER_TTL_SECONDS, maxsize=64, persist=True, cache_if=bool)
+def get_forecast(city=DEFAULT_WEATHER_CITY):
+    if not rate_limit("openweathermap"):
+        return []
     url = f"https://api.openweathermap.org/data/2.5/forecast"
     params = {
-        "q": "Los Angeles,US",
+        "q": city,
         "appid": OPENWEATHERMAP_API_KEY,
         "units": "metric"
     }
-    response = requests.get(url, params=params)
-    weather_data = response.json().get("list", [])
-
-    arrival_timestamp = int(time.mktime(time.strptime(arrival_time, "%Y-%m-%dT%H:%M:%S")))
-
-    closest_forecast = None
-    closest_time_diff = float('inf')
-
-    for forecast in weather_data:
-        forecast_timestamp = forecast['dt']
-        time_diff = abs(forecast_timestamp - arrival_timestamp)
-        if time_diff < closest_time_diff:
-            closest_time_diff = time_diff
-            closest_forecast = forecast
-
-    if closest_forecast:
-        return [{
-            "Time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(closest_forecast['dt'])),
-            "Temperature (C)": closest_forecast['main']['temp'],
-            "Max Temperature (C)": closest_forecast['main']['temp_max'],
-            "Min Temperature (C)": closest_forecast['main']['temp_min'],
-            "Humidity (%)": closest_forecast['main']['humidity'],
-            "Weather": closest_forecast['weather'][0]['description'],
-            "Wind Speed (m/s)": closest_forecast['wind']['speed'],
-            "Wind Direction": closest_forecast['wind'].get('deg', 'N/A'),
-            "Cloudiness (%)": closest_forecast['clouds']['all']
-        }]
-    else:
-        return [{"Time": arrival_time, "Weather": "No data"}]
-
-@lru_cache(maxsize=1)  # Cache the results for this function
-def get_detailed_traffic_data():
-    origin_lat, origin_lon = 33.9416, -118.4085  # LAX coordinates
-    dest_lat, dest_lon = 34.5889, -120.0382  # Example wine farm coordinates
-    url = f"https://api.tomtom.com/routing/1/calculateRoute/{origin_lat},{origin_lon}:{dest_lat},{dest_lon}/json"
+    try:
+        # Pooled session: bounded by HTTP_TIMEOUT_SECONDS and retried on 429/5xx
+        with provider_call("openweathermap"):
+            response = http_get(url, params=params)
+        return response.json().get("list", [])
+    except (requests.RequestException, ValueError) as e:
+        logger.warning("Error fetching forecast: %s", e)
+        return []
+
+def get_weather_at_arrivals(arrival_times, city=DEFAULT_WEATHER_CITY, tz=ARRIVAL_TIMEZONE):
+    """Weather at each arrival time (local time in `tz`), from one forecast fetch and one vectorized lookup."""
+    return get_timeline(city, get_forecast(city)).lookup(list(arrival_times), tz)
+
+def get_weather_at_arrival(arrival_time, city=DEFAULT_WEATHER_CITY, tz=ARRIVAL_TIMEZONE):
+    return get_weather_at_arrivals([arrival_time], city, tz)
+
+def add_arrival_weather(offers, city=DEFAULT_WEATHER_CITY, tz=ARRIVAL_TIMEZONE):
+    """Add arrival temperature, weather and wind columns to a flattened offer table."""
+    weather = pd.DataFrame(get_weather_at_arrivals(offers["arrival_time"], city, tz), index=offers.index)
+    return offers.assign(
+        arrival_temperature=weather.get("Temperature (C)"),
+        arrival_weather=weather.get("Weather"),
+        arrival_wind_speed=weather.get("Wind Speed (m/s)")
+    )
+
+@ttl_cache(ttl=TRAFFIC_TTL_SECONDS, maxsize=256, persist=True, cache_if=bool)
+def get_route(origin_lat, origin_lon, dest_lat, dest_lon):
+    if not rate_limit("tomtom"):
+        return []
+    url = f"{TOMTOM_BASE_URL}/routing/1/calculateRoute/{origin_lat},{origin_lon}:{dest_lat},{dest_lon}/json"
 
     params = {'key': TOMTOM_API_KEY, 'traffic': 'true', 'routeType': 'fastest'}
-    response = requests.get(url, params=params)
+    try:
+        # Pooled session, so route matrices reuse connections across legs
+        with provider_call("tomtom"):
+            response = http_get(url, params=params)
+        return response.json().get('routes', [])
+    except (requests.RequestException, ValueError) as e:
+        logger.warning("Error fetching route: %s", e)
+        return []
 
-    route_info = response.json().get('routes', [])
+def get_detailed_traffic_data(origin=LAX_COORDINATES, destination=WINE_FARM_COORDINATES):
+    route_info = get_route(origin[0], origin[1], destination[0], destination[1])
     if not route_info:
-        print("No route information found.")
+        logger.info("No route information found.")
         return []
 
     sections = route_info[0].get('sections', [])
@@ -125,40 +190,3 @@ def get_detailed_traffic_data():
         traffic_details.append(traffic_detail)
 
     return traffic_details
-
-
-def save_data_to_csv(all_flights, best_flight, arrival_weather, traffic_details, file_name="logistics_analysis_detailed.csv"):
-    # Define the path to the 'data' directory within the project
-    project_dir = os.getcwd()  # Get the current working directory (your project folder)
-    data_dir = os.path.join(project_dir, "data")
-    
-    # Ensure the 'data' directory exists
-    if not os.path.exists(data_dir):
-        os.makedirs(data_dir)
-    
-    # Set the file path to save the CSV file in the 'data' directory
-    file_path_csv = os.path.join(data_dir, file_name)
-
-    # Prepare the DataFrames
-    df_flights = pd.DataFrame([{
-        "Price": flight['price']['total'],
-        "Duration": flight['itineraries'][0]['duration'],
-        "Departure Time": flight['itineraries'][0]['segments'][0]['departure']['at'],
-        "Arrival Time": flight['itineraries'][0]['segments'][-1]['arrival']['at'],
-        "Airline": flight['itineraries'][0]['segments'][0]['carrierCode'],
-        "Stops": len(flight['itineraries'][0]['segments']) - 1,
-        "Cabin Class": flight.get('travelerPricings', [{}])[0].get('fareDetailsBySegment', [{}])[0].get('cabin', "N/A")
-    } for flight in all_flights])
-
-    df_best_flight = pd.DataFrame([best_flight])
-    df_weather = pd.DataFrame(arrival_weather)
-    df_traffic = pd.DataFrame(traffic_details)
-
-    # Combine all dataframes into one (optional - if you want all data combined in one CSV)
-    all_data_combined = pd.concat([df_flights, df_best_flight, df_weather, df_traffic], ignore_index=True)
-
-    # Save combined data to a CSV file
-    all_data_combined.to_csv(file_path_csv, index=False)
-
-    print(f"Data saved to {file_path_csv} (CSV)")
-
@@ -0,0 +1,185 @@
+import os
+import logging
+import json
+import time
+import threading
+from datetime import datetime
+from atomic_file import atomic_path
+from data_store import DATA_FOLDER
+from single_flight import file_lock
+import logistics_module
+import logistics_store
+from flight_ranking import flatten_offers
+
+logger = logging.getLogger(__name__)
+
+# How often flights, weather and traffic are refreshed
+LOGISTICS_REFRESH_SECONDS = int(os.getenv('LOGISTICS_REFRESH_SECONDS', 900))
+# How soon a missing or incomplete snapshot is retried
+LOGISTICS_RETRY_SECONDS = int(os.getenv('LOGISTICS_RETRY_SECONDS', 60))
+# Latest snapshot, shared by every worker
+SNAPSHOT_FILE = os.path.join(DATA_FOLDER, ".cache", "logistics_snapshot.json")
+
+# Snapshot currently served by this worker: {"mtime": int, "data": dict}
+_snapshot = {"mtime": None, "data": None}
+_snapshot_lock = threading.Lock()
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def _attempt(snapshot, part, func, *args):
+    # One provider failing (or returning nothing) must not keep the others from being published
+    try:
+        result = func(*args)
+    except Exception:
+        logger.exception("Logistics refresh: fetching %s failed", part)
+        result = None
+    if result is None or len(result) == 0:
+        snapshot["failed"].append(part)
+    return result
+
+
+def build_snapshot():
+    """Call the providers and assemble everything the /logistics page shows.
+
+    Providers are called independently: parts that fail are listed in
+    `failed` and left empty, and the rest is still published.
+    """
+    snapshot = {
+        "refreshed_at": datetime.now().isoformat(timespec="seconds"),
+        "best_flight": None,
+        "arrival_weather": [],
+        "traffic_details": [],
+        "arrival_time_formatted": None,
+        "ranked_flights": [],
+        "error": None,
+        "failed": [],
+    }
+
+    snapshot["traffic_details"] = _attempt(snapshot, "traffic", logistics_module.get_detailed_traffic_data) or []
+
+    all_flights = _attempt(snapshot, "flights", logistics_module.fetch_flight_data_with_rate_limit) or []
+    if not all_flights:
+        snapshot["error"] = "Failed to fetch flight data."
+        return snapshot, None
+
+    # Flattened once; the best flight, the ranking and the history store all read this table
+    offers = _attempt(snapshot, "flights", flatten_offers, all_flights, logistics_module.DEFAULT_ORIGIN, logistics_module.DEFAULT_DESTINATION)
+    best_flight = logistics_module.find_best_flight(offers) if offers is not None else None
+    if not best_flight:
+        snapshot["error"] = "No best flight found."
+        return snapshot, offers
+
+    snapshot["ranked_flights"] = _attempt(snapshot, "ranking", logistics_module.rank_flights, offers) or []
+    arrival_time = best_flight["Arrival Time"]
+    snapshot["best_flight"] = best_flight
+    try:
+        snapshot["arrival_time_formatted"] = datetime.strptime(arrival_time, "%Y-%m-%dT%H:%M:%S").strftime("%B %d, %Y, %H:%M %p")
+    except (TypeError, ValueError):
+        snapshot["arrival_time_formatted"] = arrival_time
+    snapshot["arrival_weather"] = _attempt(snapshot, "weather", logistics_module.get_weather_at_arrival, arrival_time) or []
+    return snapshot, offers
+
+
+def _publish(snapshot):
+    os.makedirs(os.path.dirname(SNAPSHOT_FILE), exist_ok=True)
+    with atomic_path(SNAPSHOT_FILE) as tmp_path, open(tmp_path, "w") as f:
+        json.dump(snapshot, f)
+
+
+def _snapshot_age():
+    try:
+        return time.time() - os.path.getmtime(SNAPSHOT_FILE)
+    except OSError:
+        return None
+
+
+def _due_in():
+    """Seconds until the published snapshot should be refreshed (<= 0 when due).
+
+    A complete snapshot is kept for LOGISTICS_REFRESH_SECONDS; a missing one,
+    or one with an error or a failed provider, is retried after LOGISTICS_RETRY_SECONDS.
+    """
+    age = _snapshot_age()
+    if age is None:
+        return 0
+    snapshot = _read_snapshot()
+    complete = snapshot is not None and not snapshot.get("error") and not snapshot.get("failed")
+    return (LOGISTICS_REFRESH_SECONDS if complete else LOGISTICS_RETRY_SECONDS) - age
+
+
+def refresh_once():
+    """Refresh and publish the snapshot unless another worker already did so recently.
+
+    Returns True if this call refreshed the snapshot.
+    """
+    with file_lock("logistics:refresh", blocking=False) as acquired:
+        if not acquired:
+            return False
+        if _due_in() > 0:
+            return False
+
+        snapshot, offers = build_snapshot()
+        _publish(snapshot)
+        if snapshot["best_flight"]:
+            # Appended to the history store by its own writer thread
+            logistics_store.record_snapshot(
+                offers, snapshot["best_flight"], snapshot["arrival_weather"], snapshot["traffic_details"],
+                origin=logistics_module.DEFAULT_ORIGIN,
+                destination=logistics_module.DEFAULT_DESTINATION,
+                city=logistics_module.DEFAULT_WEATHER_CITY,
+                traffic_route=(logistics_module.LAX_COORDINATES, logistics_module.WINE_FARM_COORDINATES)
+            )
+        if snapshot["failed"]:
+            logger.warning("Logistics snapshot refreshed at %s without %s; retrying in %ss.",
+                           snapshot['refreshed_at'], ", ".join(snapshot["failed"]), LOGISTICS_RETRY_SECONDS)
+        else:
+            logger.info("Logistics snapshot refreshed at %s.", snapshot['refreshed_at'])
+        return True
+
+
+def _run():
+    while True:
+        try:
+            refresh_once()
+            wait = _due_in()
+        except Exception:
+            logger.exception("Logistics refresh failed")
+            wait = LOGISTICS_RETRY_SECONDS
+        # Wake up when the current snapshot is due, but never spin
+        time.sleep(max(wait, 5))
+
+
+def start():
+    """Start this worker's refresher thread (once). Only one worker refreshes per interval."""
+    global _thread
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name="logistics-refresher", daemon=True)
+            _thread.start()
+
+
+def _read_snapshot():
+    # The published snapshot, re-read only when the file changes
+    try:
+        mtime = os.stat(SNAPSHOT_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _snapshot["mtime"] == mtime:
+        return _snapshot["data"]
+
+    with _snapshot_lock:
+        if _snapshot["mtime"] != mtime:
+            try:
+                with open(SNAPSHOT_FILE) as f:
+                    _snapshot["data"] = json.load(f)
+                _snapshot["mtime"] = mtime
+            except (OSError, ValueError) as e:
+                logger.warning("Failed to read logistics snapshot: %s", e)
+        return _snapshot["data"]
+
+
+def get_snapshot():
+    """Return the latest published snapshot, or None before the first refresh has finished."""
+    start()
+    return _read_snapshot()
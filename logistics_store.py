@@ -0,0 +1,247 @@
+import os
+import logging
+import time
+import queue
+import sqlite3
+import threading
+from contextlib import closing
+import pandas as pd
+from data_store import DATA_FOLDER
+
+logger = logging.getLogger(__name__)
+
+# Append-only history of every logistics refresh, one table per kind of data
+LOGISTICS_DB = os.getenv('LOGISTICS_DB', os.path.join(DATA_FOLDER, "logistics.sqlite3"))
+# Snapshots written per transaction by the background writer
+WRITE_BATCH_SIZE = int(os.getenv('LOGISTICS_WRITE_BATCH_SIZE', 32))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flight_offers (
+    fetched_at REAL NOT NULL,
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    offer_id TEXT,
+    price REAL,
+    currency TEXT,
+    duration TEXT,
+    duration_minutes REAL,
+    stops INTEGER,
+    carrier TEXT,
+    cabin TEXT,
+    departure_time TEXT,
+    arrival_time TEXT
+);
+CREATE INDEX IF NOT EXISTS flight_offers_route_time ON flight_offers (origin, destination, fetched_at);
+CREATE INDEX IF NOT EXISTS flight_offers_time ON flight_offers (fetched_at);
+
+CREATE TABLE IF NOT EXISTS selections (
+    fetched_at REAL NOT NULL,
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    price REAL,
+    duration TEXT,
+    departure_time TEXT,
+    arrival_time TEXT,
+    carrier TEXT,
+    stops INTEGER,
+    cabin TEXT
+);
+CREATE INDEX IF NOT EXISTS selections_route_time ON selections (origin, destination, fetched_at);
+
+CREATE TABLE IF NOT EXISTS weather (
+    fetched_at REAL NOT NULL,
+    city TEXT NOT NULL,
+    forecast_time TEXT,
+    temperature REAL,
+    temp_max REAL,
+    temp_min REAL,
+    humidity REAL,
+    description TEXT,
+    wind_speed REAL,
+    wind_direction TEXT,
+    cloudiness REAL
+);
+CREATE INDEX IF NOT EXISTS weather_city_time ON weather (city, fetched_at);
+
+CREATE TABLE IF NOT EXISTS traffic (
+    fetched_at REAL NOT NULL,
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    start_point TEXT,
+    end_point TEXT,
+    length_meters REAL,
+    travel_time_seconds REAL,
+    traffic_delay_seconds REAL,
+    speed REAL,
+    traffic_level TEXT
+);
+CREATE INDEX IF NOT EXISTS traffic_route_time ON traffic (origin, destination, fetched_at);
+CREATE INDEX IF NOT EXISTS traffic_time ON traffic (fetched_at);
+"""
+
+# strftime formats for trend buckets
+TREND_BUCKETS = {
+    "hour": "%Y-%m-%d %H:00",
+    "day": "%Y-%m-%d",
+    "month": "%Y-%m",
+}
+
+_queue = queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+_schema_ready = set()
+
+
+def connect(path=None):
+    """Open a connection to the store, creating the tables on first use."""
+    path = path or LOGISTICS_DB
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30)
+    if path not in _schema_ready:
+        # WAL lets readers in other workers query while the writer appends
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        _schema_ready.add(path)
+    return connection
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def snapshot_rows(offers, best_flight, arrival_weather, traffic_details, origin, destination, city, traffic_route, fetched_at):
+    """Turn one refresh into rows for each table. `offers` is the refresh's flattened offer table."""
+    flight_rows = [
+        (fetched_at, row.origin, row.destination, row.offer_id, _number(row.price), row.currency, row.duration,
+         _number(row.duration_minutes), int(row.stops), row.carrier, row.cabin, row.departure_time, row.arrival_time)
+        for row in (offers.itertuples(index=False) if offers is not None else ())
+    ]
+
+    selection_rows = []
+    if best_flight:
+        selection_rows.append((
+            fetched_at, best_flight.get("Origin", origin), best_flight.get("Destination", destination),
+            _number(best_flight.get("Flight Price")), best_flight.get("Flight Duration"),
+            best_flight.get("Departure Time"), best_flight.get("Arrival Time"), best_flight.get("Airline"),
+            best_flight.get("Stops"), best_flight.get("Cabin Class")
+        ))
+
+    weather_rows = [
+        (fetched_at, city, forecast.get("Time"), _number(forecast.get("Temperature (C)")),
+         _number(forecast.get("Max Temperature (C)")), _number(forecast.get("Min Temperature (C)")),
+         _number(forecast.get("Humidity (%)")), forecast.get("Weather"), _number(forecast.get("Wind Speed (m/s)")),
+         str(forecast.get("Wind Direction")), _number(forecast.get("Cloudiness (%)")))
+        for forecast in arrival_weather or []
+    ]
+
+    route_origin, route_destination = (f"{lat},{lon}" for lat, lon in traffic_route)
+    traffic_rows = [
+        (fetched_at, route_origin, route_destination, section.get("Start Point"), section.get("End Point"),
+         _number(section.get("Distance (meters)")), _number(section.get("Travel Time (seconds)")),
+         _number(section.get("Traffic Delay (seconds)")), _number(section.get("Average Speed (m/s)")),
+         section.get("Traffic Level"))
+        for section in traffic_details or []
+    ]
+    return {
+        "flight_offers": flight_rows,
+        "selections": selection_rows,
+        "weather": weather_rows,
+        "traffic": traffic_rows,
+    }
+
+
+def write_rows(connection, batches):
+    """Append a list of snapshot_rows() results in one transaction."""
+    with connection:
+        for table in ("flight_offers", "selections", "weather", "traffic"):
+            rows = [row for batch in batches for row in batch[table]]
+            if rows:
+                placeholders = ", ".join("?" * len(rows[0]))
+                connection.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+
+
+def _run():
+    connection = None
+    while True:
+        snapshots = [_queue.get()]
+        # Drain whatever else is already waiting, so bursts become one transaction
+        while len(snapshots) < WRITE_BATCH_SIZE:
+            try:
+                snapshots.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            # Opened here, so a store that can't be opened drops batches instead of killing the thread
+            if connection is None:
+                connection = connect()
+            write_rows(connection, [snapshot_rows(*snapshot) for snapshot in snapshots])
+        except Exception:
+            logger.exception("Failed to write %d logistics snapshot(s) to the history store", len(snapshots))
+            # Reconnect for the next batch in case the connection itself is broken
+            if connection is not None:
+                connection.close()
+                connection = None
+        finally:
+            # Always, so flush() returns even when the store is broken
+            for _ in snapshots:
+                _queue.task_done()
+
+
+def start_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_run, name="logistics-writer", daemon=True)
+            _writer.start()
+
+
+def record_snapshot(offers, best_flight, arrival_weather, traffic_details, origin, destination, city, traffic_route, fetched_at=None):
+    """Queue one refresh for the background writer and return straight away."""
+    fetched_at = fetched_at if fetched_at is not None else time.time()
+    # Rows are built on the writer thread too; the caller only pays for the put()
+    _queue.put((offers, best_flight, arrival_weather, traffic_details, origin, destination, city, traffic_route, fetched_at))
+    start_writer()
+
+
+def flush():
+    """Block until every queued snapshot has been written."""
+    _queue.join()
+
+
+def _since_clause(since):
+    return (" AND fetched_at >= ?", [since]) if since is not None else ("", [])
+
+
+def price_trend(origin, destination, bucket="day", since=None):
+    """Min/average/max offer price and offer count per time bucket (UTC) for a route."""
+    since_sql, since_params = _since_clause(since)
+    query = f"""
+        SELECT strftime(?, fetched_at, 'unixepoch') AS bucket,
+               MIN(price) AS min_price, AVG(price) AS avg_price, MAX(price) AS max_price, COUNT(*) AS offers
+        FROM flight_offers
+        WHERE origin = ? AND destination = ?{since_sql}
+        GROUP BY bucket ORDER BY bucket
+    """
+    with closing(connect()) as connection:
+        return pd.read_sql_query(query, connection, params=[TREND_BUCKETS[bucket], origin, destination, *since_params])
+
+
+def delay_trend(origin=None, destination=None, bucket="hour", since=None):
+    """Average/max traffic delay and travel time per time bucket (UTC), optionally for one route."""
+    since_sql, since_params = _since_clause(since)
+    route_sql, route_params = "", []
+    if origin is not None and destination is not None:
+        route_sql, route_params = " AND origin = ? AND destination = ?", [origin, destination]
+    query = f"""
+        SELECT strftime(?, fetched_at, 'unixepoch') AS bucket,
+               AVG(traffic_delay_seconds) AS avg_delay_seconds, MAX(traffic_delay_seconds) AS max_delay_seconds,
+               AVG(travel_time_seconds) AS avg_travel_time_seconds, COUNT(*) AS sections
+        FROM traffic
+        WHERE 1 = 1{route_sql}{since_sql}
+        GROUP BY bucket ORDER BY bucket
+    """
+    with closing(connect()) as connection:
+        return pd.read_sql_query(query, connection, params=[TREND_BUCKETS[bucket], *route_params, *since_params])
@@ -0,0 +1,30 @@
+from flask import request
+
+# Listing pages and API responses are paginated server-side
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+# Helper function to read page/page_size from the query string
+def get_page_args():
+    page = max(request.args.get('page', 1, type=int), 1)
+    page_size = request.args.get('page_size', DEFAULT_PAGE_SIZE, type=int)
+    return page, min(max(page_size, 1), MAX_PAGE_SIZE)
+
+
+# Helper function to describe the current page for the pagination controls
+def get_pagination(total, page, page_size):
+    pages = max((total + page_size - 1) // page_size, 1)
+    return {"page": page, "page_size": page_size, "total": total, "pages": pages}
+
+
+# Helper function to read the /wines filters from the query string
+def get_wine_filters():
+    return {
+        "wine_type": request.args.get('wine_type'),
+        "supplier": request.args.get('supplier'),
+        "min_price": request.args.get('min_price', type=float),
+        "max_price": request.args.get('max_price', type=float),
+        "min_score": request.args.get('min_score', type=float),
+        "max_score": request.args.get('max_score', type=float),
+    }
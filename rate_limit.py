@@ -0,0 +1,88 @@
+import os
+import logging
+import time
+import threading
+from single_flight import LOCK_FOLDER, file_lock
+
+logger = logging.getLogger(__name__)
+
+# Requests per second and burst size allowed for each external provider, shared by every worker process
+PROVIDER_LIMITS = {
+    "amadeus": (float(os.getenv('AMADEUS_RATE_PER_SECOND', 1)), int(os.getenv('AMADEUS_BURST', 1))),
+    "openweathermap": (float(os.getenv('OPENWEATHERMAP_RATE_PER_SECOND', 1)), int(os.getenv('OPENWEATHERMAP_BURST', 5))),
+    "tomtom": (float(os.getenv('TOMTOM_RATE_PER_SECOND', 5)), int(os.getenv('TOMTOM_BURST', 5))),
+}
+# How long a provider call waits for a token before giving up
+RATE_LIMIT_TIMEOUT_SECONDS = float(os.getenv('RATE_LIMIT_TIMEOUT_SECONDS', 30))
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second refill a bucket of size `capacity`.
+
+    The bucket's level is kept in a small file next to the cross-process locks
+    and only read or updated under the bucket's file lock, so all gunicorn
+    workers draw from one bucket and together stay within the configured rate.
+    """
+
+    def __init__(self, name, rate, capacity):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.path = os.path.join(LOCK_FOLDER, f"rate-{name}.state")
+        # file_lock is a no-op where fcntl is missing; this still serializes threads
+        self._lock = threading.Lock()
+
+    def _load(self, now):
+        try:
+            with open(self.path) as f:
+                tokens, updated = (float(value) for value in f.read().split())
+        except (OSError, ValueError):
+            return float(self.capacity)
+        # Wall-clock time, since monotonic clocks are not comparable across processes
+        return min(self.capacity, tokens + max(now - updated, 0) * self.rate)
+
+    def _take(self, tokens):
+        # Returns 0 if the tokens were taken, else how long to wait before trying again
+        with self._lock, file_lock(f"rate:{self.name}"):
+            now = time.time()
+            available = self._load(now)
+            wait = 0.0
+            if available >= tokens:
+                available -= tokens
+            else:
+                wait = (tokens - available) / self.rate
+            try:
+                os.makedirs(LOCK_FOLDER, exist_ok=True)
+                with open(self.path, "w") as f:
+                    f.write(f"{available} {now}")
+            except OSError as e:
+                logger.warning("Failed to store the %s rate limit state: %s", self.name, e)
+            return wait
+
+    def acquire(self, tokens=1, timeout=None):
+        """Wait until tokens are available. Returns False if the timeout expires first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._take(tokens)
+            if wait == 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+_buckets = {name: TokenBucket(name, rate, burst) for name, (rate, burst) in PROVIDER_LIMITS.items()}
+
+
+def rate_limit(provider, timeout=RATE_LIMIT_TIMEOUT_SECONDS):
+    """Wait for the provider's quota. Returns False if no token became available in time."""
+    bucket = _buckets.get(provider)
+    if bucket is None:
+        return True
+    acquired = bucket.acquire(timeout=timeout)
+    if not acquired:
+        logger.warning("Rate limit for %s exceeded; skipping call.", provider)
+    return acquired
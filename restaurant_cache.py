@@ -0,0 +1,175 @@
+import os
+import logging
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import pandas as pd
+from atomic_file import atomic_path
+from data_store import DATA_FOLDER, apply_dtypes, register_refresher
+from single_flight import file_lock
+from instrumentation import count_cache
+
+logger = logging.getLogger(__name__)
+
+# One CSV partition per normalized city, plus the combined file the rest of the app reads
+CACHE_FOLDER = os.path.join(DATA_FOLDER, "restaurant_cache")
+COMBINED_FILE = os.path.join(DATA_FOLDER, "restaurant_and_wine_data.csv")
+# Present while a partition has changed since the combined file was last rebuilt
+COMBINED_STALE_MARKER = os.path.join(CACHE_FOLDER, ".combined-stale")
+# Number of city partitions kept parsed in memory per worker
+LRU_SIZE = int(os.getenv('RESTAURANT_CACHE_LRU_SIZE', 32))
+
+# In-process LRU of parsed partitions: key -> {"version": (mtime_ns, size), "frame": DataFrame}
+_lru = OrderedDict()
+_lock = threading.Lock()
+
+
+def normalize_city(city):
+    """Cache key for a city: whitespace-collapsed and case-folded."""
+    return " ".join(str(city).split()).casefold()
+
+
+def partition_path(city):
+    key = normalize_city(city)
+    slug = re.sub(r'[^a-z0-9]+', '-', key).strip('-') or "city"
+    # Short hash keeps names that slugify the same ("São Paulo" / "Sao Paulo") apart
+    digest = hashlib.sha1(key.encode()).hexdigest()[:8]
+    return os.path.join(CACHE_FOLDER, f"{slug}-{digest}.csv")
+
+
+def _version(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def partition_version(city):
+    """(mtime_ns, size) of a city's partition, or None if it was never fetched."""
+    return _version(partition_path(city))
+
+
+def _remember(key, version, frame):
+    with _lock:
+        _lru[key] = {"version": version, "frame": frame}
+        _lru.move_to_end(key)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _migrate_legacy():
+    # Split the old single-file cache into per-city partitions once
+    if os.path.isdir(CACHE_FOLDER):
+        return
+    with file_lock("restaurants:combined"):
+        if os.path.isdir(CACHE_FOLDER):
+            return
+        # Build the partitions next to the final folder and rename it into place,
+        # so other workers see either no cache folder or a complete one
+        tmp_folder = f"{CACHE_FOLDER}.{os.getpid()}.tmp"
+        os.makedirs(tmp_folder, exist_ok=True)
+        try:
+            legacy = pd.read_csv(COMBINED_FILE) if os.path.exists(COMBINED_FILE) else pd.DataFrame()
+        except Exception as e:
+            logger.warning("Failed to read legacy cache file %s: %s", COMBINED_FILE, e)
+            legacy = pd.DataFrame()
+        if "City" in legacy.columns:
+            for _, city_rows in legacy.groupby(legacy["City"].map(normalize_city), sort=False):
+                file_name = os.path.basename(partition_path(city_rows["City"].iloc[0]))
+                city_rows.to_csv(os.path.join(tmp_folder, file_name), index=False)
+        os.replace(tmp_folder, CACHE_FOLDER)
+
+
+def _write_atomic(frame, path):
+    # Renamed into place, so readers never see a half-written file
+    with atomic_path(path) as tmp_path:
+        frame.to_csv(tmp_path, index=False)
+
+
+def read_partition(city):
+    """Return the cached rows for a city (empty if never fetched).
+
+    Costs one stat() when the partition is already parsed in memory.
+    """
+    _migrate_legacy()
+    key = normalize_city(city)
+    path = partition_path(city)
+    version = _version(path)
+    if version is None:
+        count_cache("restaurant_partition", "absent")
+        return pd.DataFrame()
+
+    entry = _lru.get(key)
+    if entry is not None and entry["version"] == version:
+        with _lock:
+            if key in _lru:
+                _lru.move_to_end(key)
+        count_cache("restaurant_partition", "hit")
+        return entry["frame"]
+
+    count_cache("restaurant_partition", "miss")
+    frame = apply_dtypes("restaurants", pd.read_csv(path))
+    _remember(key, version, frame)
+    return frame
+
+
+def is_fresh(frame, expiry_hours):
+    """True if the newest entry in the frame is younger than expiry_hours."""
+    if frame.empty or "Timestamp" not in frame.columns:
+        return False
+    latest_entry = frame["Timestamp"].max()
+    if pd.isna(latest_entry):
+        return False
+    return datetime.now() - latest_entry <= timedelta(hours=expiry_hours)
+
+
+def write_partition(city, frame):
+    """Atomically replace a city's partition and mark the combined file stale.
+
+    Other cities are left untouched, so fetching one city never evicts another,
+    and the combined file is only rebuilt when it is next read.
+    """
+    _migrate_legacy()
+    path = partition_path(city)
+    _write_atomic(frame, path)
+    _remember(normalize_city(city), _version(path), apply_dtypes("restaurants", frame))
+    # Written after the partition, so a rebuild that clears the marker already sees it
+    with open(COMBINED_STALE_MARKER, "w"):
+        pass
+
+
+def refresh_combined():
+    """Rebuild the combined file if a partition changed since the last rebuild.
+
+    Costs one stat() when nothing changed; many city refreshes between reads
+    cost a single rebuild.
+    """
+    if not os.path.exists(COMBINED_STALE_MARKER):
+        return
+    # Serialized across workers so two concurrent rebuilds can't drop each other's city
+    with file_lock("restaurants:combined"):
+        try:
+            os.remove(COMBINED_STALE_MARKER)
+        except FileNotFoundError:
+            # Another worker rebuilt it while we waited for the lock
+            return
+        _write_combined()
+
+
+def _write_combined():
+    # The dashboard and other readers still expect one file with every city
+    partitions = []
+    for file_name in sorted(os.listdir(CACHE_FOLDER)):
+        if file_name.endswith(".csv"):
+            try:
+                partitions.append(pd.read_csv(os.path.join(CACHE_FOLDER, file_name)))
+            except Exception as e:
+                logger.warning("Skipping unreadable cache partition %s: %s", file_name, e)
+    if partitions:
+        _write_atomic(pd.concat(partitions, ignore_index=True), COMBINED_FILE)
+
+
+register_refresher("restaurants", refresh_combined)
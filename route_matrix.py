@@ -0,0 +1,181 @@
+import os
+import logging
+import queue
+import threading
+import numpy as np
+import pandas as pd
+from http_pool import HTTP_CONCURRENCY, fetch_all
+import logistics_module
+import restaurant_cache
+
+logger = logging.getLogger(__name__)
+
+# Delivery points are snapped to this many decimals before routing (3 ~ 110 m),
+# so restaurants on the same block share one leg
+ROUTE_GRID_DECIMALS = int(os.getenv('ROUTE_GRID_DECIMALS', 3))
+# Points further than this from the origin (great-circle) are not routed at all
+ROUTE_MAX_DISTANCE_KM = float(os.getenv('ROUTE_MAX_DISTANCE_KM', 300))
+# Routing calls in flight at once; the TomTom token bucket still applies
+ROUTE_CONCURRENCY = int(os.getenv('ROUTE_CONCURRENCY', HTTP_CONCURRENCY))
+# Uncached legs a cached-only matrix hands to the background fetcher per call; the rest stay pending
+ROUTE_QUEUE_LEGS_PER_REQUEST = int(os.getenv('ROUTE_QUEUE_LEGS_PER_REQUEST', 20))
+# Legs waiting for the background fetcher, per worker
+ROUTE_QUEUE_SIZE = int(os.getenv('ROUTE_QUEUE_SIZE', 1000))
+
+EARTH_RADIUS_KM = 6371.0088
+
+MATRIX_COLUMNS = [
+    "distance_km", "status", "length_meters", "travel_time_seconds", "traffic_delay_seconds", "eta_minutes",
+]
+
+# Marks a leg that is not cached yet in a cached-only matrix
+PENDING = object()
+
+# (origin, leg) pairs waiting to be routed by the background fetcher
+_queue = queue.Queue(maxsize=ROUTE_QUEUE_SIZE)
+_queued = set()
+_queued_lock = threading.Lock()
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def haversine_km(origin_lat, origin_lon, lats, lons):
+    """Great-circle distance in km from one origin to many points, vectorized."""
+    lat1, lon1 = np.radians(origin_lat), np.radians(origin_lon)
+    lat2, lon2 = np.radians(np.asarray(lats, dtype='float64')), np.radians(np.asarray(lons, dtype='float64'))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _route_summary(origin, leg):
+    # get_route is TTL-cached per leg, so repeated matrices only pay for new legs
+    routes = logistics_module.get_route(origin[0], origin[1], leg[0], leg[1])
+    if not routes:
+        return None
+    return routes[0].get('summary', {})
+
+
+def _cached_summary(origin, leg):
+    routes = logistics_module.get_route.cache_get(origin[0], origin[1], leg[0], leg[1])
+    if routes is None:
+        return PENDING
+    return routes[0].get('summary', {})
+
+
+def _run_fetcher():
+    while True:
+        origin, leg = _queue.get()
+        try:
+            # Cached by get_route, so the next matrix picks the leg up
+            _route_summary(origin, leg)
+        except Exception:
+            logger.exception("Background route fetch to %s failed", leg)
+        finally:
+            with _queued_lock:
+                _queued.discard((origin, leg))
+            _queue.task_done()
+
+
+def queue_legs(origin, legs):
+    """Hand legs to this worker's background fetcher; legs already queued, or beyond a full queue, are skipped."""
+    global _fetcher
+    for leg in legs:
+        item = (tuple(origin), tuple(leg))
+        with _queued_lock:
+            if item in _queued:
+                continue
+            _queued.add(item)
+            try:
+                _queue.put_nowait(item)
+            except queue.Full:
+                _queued.discard(item)
+                break
+    with _fetcher_lock:
+        if _fetcher is None or not _fetcher.is_alive():
+            _fetcher = threading.Thread(target=_run_fetcher, name="route-fetcher", daemon=True)
+            _fetcher.start()
+
+
+def route_matrix(origin, lats, lons, max_distance_km=None, decimals=None, max_workers=None, cached_only=False):
+    """Travel time and traffic delay from origin to every (lat, lon) point.
+
+    Returns one row per point, in input order, with a status of "ok",
+    "out_of_range" (prefiltered by great-circle distance), "no_route" or
+    "invalid" (missing coordinates). Points that round to the same grid cell
+    share a single routing call.
+
+    With cached_only=True no routing call is made: legs that are not cached
+    yet get the status "pending" and up to ROUTE_QUEUE_LEGS_PER_REQUEST of
+    them are queued for the background fetcher.
+    """
+    max_distance_km = ROUTE_MAX_DISTANCE_KM if max_distance_km is None else max_distance_km
+    decimals = ROUTE_GRID_DECIMALS if decimals is None else decimals
+    lats = np.asarray(lats, dtype='float64')
+    lons = np.asarray(lons, dtype='float64')
+
+    matrix = pd.DataFrame({
+        "distance_km": haversine_km(origin[0], origin[1], lats, lons),
+        "status": "invalid",
+        "length_meters": np.nan,
+        "travel_time_seconds": np.nan,
+        "traffic_delay_seconds": np.nan,
+        "eta_minutes": np.nan,
+    }, columns=MATRIX_COLUMNS)
+
+    valid = ~(np.isnan(lats) | np.isnan(lons))
+    in_range = valid & (matrix["distance_km"].to_numpy() <= max_distance_km)
+    matrix.loc[valid & ~in_range, "status"] = "out_of_range"
+    if not in_range.any():
+        return matrix
+
+    # One leg per grid cell; `inverse` maps every in-range point back to its leg
+    cells = np.column_stack([lats[in_range], lons[in_range]]).round(decimals)
+    legs, inverse = np.unique(cells, axis=0, return_inverse=True)
+    legs = [tuple(leg) for leg in legs.tolist()]
+    if cached_only:
+        summaries = [_cached_summary(origin, leg) for leg in legs]
+        pending = np.array([summary is PENDING for summary in summaries])
+        queue_legs(origin, [leg for leg, summary in zip(legs, summaries) if summary is PENDING][:ROUTE_QUEUE_LEGS_PER_REQUEST])
+    else:
+        summaries = fetch_all(lambda leg: _route_summary(origin, leg), legs, max_workers or ROUTE_CONCURRENCY)
+        pending = np.zeros(len(legs), dtype=bool)
+
+    leg_values = np.array([
+        [summary.get('lengthInMeters', np.nan), summary.get('travelTimeInSeconds', np.nan), summary.get('trafficDelayInSeconds', 0)]
+        if summary is not None and summary is not PENDING else [np.nan, np.nan, np.nan]
+        for summary in summaries
+    ], dtype='float64')
+    point_values = leg_values[inverse.ravel()]
+    point_status = np.where(pending[inverse.ravel()], "pending", np.where(np.isnan(point_values[:, 1]), "no_route", "ok"))
+
+    positions = np.flatnonzero(in_range)
+    matrix.iloc[positions, matrix.columns.get_loc("length_meters")] = point_values[:, 0]
+    matrix.iloc[positions, matrix.columns.get_loc("travel_time_seconds")] = point_values[:, 1]
+    matrix.iloc[positions, matrix.columns.get_loc("traffic_delay_seconds")] = point_values[:, 2]
+    matrix.iloc[positions, matrix.columns.get_loc("status")] = point_status
+    # travelTimeInSeconds already includes the traffic delay
+    matrix["eta_minutes"] = (matrix["travel_time_seconds"] / 60).round(1)
+    return matrix
+
+
+def restaurant_delivery_etas(city, origin=logistics_module.LAX_COORDINATES, max_distance_km=None, offset=0, limit=None, cached_only=False):
+    """Cached restaurants for a city with delivery distance, travel time, delay and ETA from origin.
+
+    `offset`/`limit` select a page of restaurants, so only their legs are routed.
+    See route_matrix for `cached_only`.
+    """
+    restaurants = restaurant_cache.read_partition(city)
+    if offset or limit is not None:
+        restaurants = restaurants.iloc[offset:offset + limit if limit is not None else None]
+    if restaurants.empty or not {"Latitude", "Longitude"} <= set(restaurants.columns):
+        return restaurants
+
+    matrix = route_matrix(
+        origin,
+        pd.to_numeric(restaurants["Latitude"], errors='coerce'),
+        pd.to_numeric(restaurants["Longitude"], errors='coerce'),
+        max_distance_km=max_distance_km,
+        cached_only=cached_only
+    )
+    matrix.index = restaurants.index
+    return pd.concat([restaurants, matrix], axis=1)
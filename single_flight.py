@@ -0,0 +1,114 @@
+import os
+import logging
+import hashlib
+import threading
+from contextlib import contextmanager
+from data_store import DATA_FOLDER
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; fall back to in-process coordination only
+    fcntl = None
+
+LOCK_FOLDER = os.path.join(DATA_FOLDER, ".locks")
+
+
+@contextmanager
+def file_lock(key, blocking=True):
+    """Hold an exclusive cross-process lock named by key.
+
+    Yields True once the lock is held. With blocking=False it yields False
+    straight away if another process holds the lock.
+    """
+    if fcntl is None:
+        yield True
+        return
+
+    os.makedirs(LOCK_FOLDER, exist_ok=True)
+    path = os.path.join(LOCK_FOLDER, hashlib.sha1(key.encode()).hexdigest() + ".lock")
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one.
+
+    The first caller for a key (the leader) runs the function while later
+    callers wait for its result. The leader also takes a file lock on the key,
+    so workers in other processes queue up behind it. Once it holds the lock it
+    runs `recheck`, which lets it pick up a result another process stored
+    while it was waiting.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, recheck=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            with file_lock(key):
+                result = recheck() if recheck is not None else None
+                call.result = result if result is not None else func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def do_in_background(self, key, func):
+        """Start func in a daemon thread unless a refresh for key is already running here or in another process.
+
+        Returns True if a refresh was started.
+        """
+        with self._lock:
+            if key in self._calls:
+                return False
+            call = self._calls[key] = _Call()
+
+        def run():
+            try:
+                with file_lock(key, blocking=False) as acquired:
+                    if acquired:
+                        call.result = func()
+            except Exception as e:
+                call.error = e
+                logger.exception("Background refresh for %s failed", key)
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        threading.Thread(target=run, name=f"refresh:{key}", daemon=True).start()
+        return True
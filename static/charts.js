@@ -1,21 +1,38 @@
-// static/js/charts.js
-function createChart(chartId, label, data) {
+// static/charts.js
+
+// Fetch JSON from the /api/v1 endpoints. The browser revalidates with
+// If-None-Match, so polling unchanged data only costs a 304.
+function fetchJSON(url) {
+    return fetch(url, { headers: { 'Accept': 'application/json' } }).then(function (response) {
+        if (!response.ok) {
+            throw new Error(url + ' returned ' + response.status);
+        }
+        return response.json();
+    });
+}
+
+function createChart(chartId, label, labels, data, type) {
     const ctx = document.getElementById(chartId).getContext('2d');
-    new Chart(ctx, {
-        type: 'line',
+    return new Chart(ctx, {
+        type: type || 'line',
         data: {
-            labels: ["Jan", "Feb", "Mar", "Apr", "May"],
+            labels: labels,
             datasets: [{
                 label: label,
                 data: data,
-                backgroundColor: 'rgba(75, 192, 192, 0.2)',
-                borderColor: 'rgba(75, 192, 192, 1)',
+                backgroundColor: type === 'pie'
+                    ? ['#ff6384', '#36a2eb', '#cc65fe', '#ffce56', '#ff9f40']
+                    : 'rgba(75, 192, 192, 0.2)',
+                borderColor: type === 'pie' ? undefined : 'rgba(75, 192, 192, 1)',
                 borderWidth: 1
             }]
         },
         options: {
             responsive: true,
-            scales: {
+            plugins: {
+                legend: { position: 'top' }
+            },
+            scales: type === 'pie' ? {} : {
                 y: { beginAtZero: true }
             }
         }
@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Caches, locks and partitions written by the code under test go to a scratch
+# folder, never to data/. Set before any app module reads DATA_FOLDER
+os.environ["DATA_FOLDER"] = tempfile.mkdtemp(prefix="tests-data-")
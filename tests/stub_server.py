@@ -0,0 +1,60 @@
+"""A local HTTP server standing in for an external provider.
+
+Unlike benchmarks/stubs.py, requests go over a real socket, so the shared
+session's connection pool, retries and timeouts are exercised too.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class StubServer:
+    """Answer every GET with handler(path, query) -> (status, headers, body).
+
+    A dict or list body is sent as JSON. Every request is recorded in
+    `requests` as (path, query) in arrival order. Use as a context manager.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+                with stub._lock:
+                    stub.requests.append((parts.path, query))
+                status, headers, body = stub.handler(parts.path, query)
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body)
+                    headers = {"Content-Type": "application/json", **headers}
+                body = body.encode() if isinstance(body, str) else body
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def paths(self, prefix=""):
+        with self._lock:
+            return [path for path, _ in self.requests if path.startswith(prefix)]
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, name="stub-server", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
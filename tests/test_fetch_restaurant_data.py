@@ -0,0 +1,109 @@
+import threading
+import time
+import unittest
+from unittest import mock
+import pandas as pd
+import fetch_restaurant_data
+import restaurant_cache
+from tests.stub_server import StubServer
+
+PLACE_IDS = [f"place-{i}" for i in range(12)]
+
+
+class PlacesStub:
+    """Google Places stand-in: slow, out-of-order details, with one 429 and one 503 on first try."""
+
+    def __init__(self, flaky=()):
+        self.flaky = dict(flaky)  # place_id -> (status, headers) returned on its first request
+        self.hits = {}  # place_id -> arrival times
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, path, query):
+        if path.endswith("/textsearch/json"):
+            return 200, {}, {"results": [{"name": place_id, "place_id": place_id} for place_id in PLACE_IDS]}
+
+        place_id = query["place_id"]
+        with self._lock:
+            self.hits.setdefault(place_id, []).append(time.monotonic())
+            first = len(self.hits[place_id]) == 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # Earlier places answer slower, so completion order is the reverse of search order
+            time.sleep(0.01 * (len(PLACE_IDS) - PLACE_IDS.index(place_id)))
+            if first and place_id in self.flaky:
+                status, headers = self.flaky[place_id]
+                return status, headers, {"status": "UNAVAILABLE"}
+            return 200, {}, {"result": {
+                "name": place_id,
+                "formatted_address": f"{place_id} Main St",
+                "geometry": {"location": {"lat": 37.77, "lng": -122.42}},
+            }}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class FetchFromApiTest(unittest.TestCase):
+    def fetch(self, stub, concurrency=4):
+        with StubServer(stub) as server, \
+                mock.patch.object(fetch_restaurant_data, "GOOGLE_PLACES_BASE_URL", server.url), \
+                mock.patch.object(fetch_restaurant_data, "PLACES_CONCURRENCY", concurrency):
+            return fetch_restaurant_data.fetch_from_api("Stubville")
+
+    def test_details_keep_search_order(self):
+        data = self.fetch(PlacesStub())
+        self.assertEqual(data["Restaurant Name"].tolist(), PLACE_IDS)
+
+    def test_429_and_5xx_are_retried_honouring_retry_after(self):
+        stub = PlacesStub(flaky={
+            "place-3": (429, {"Retry-After": "1"}),
+            "place-5": (503, {}),
+        })
+        data = self.fetch(stub)
+
+        self.assertEqual(data["Restaurant Name"].tolist(), PLACE_IDS)
+        self.assertEqual(len(stub.hits["place-3"]), 2)
+        self.assertEqual(len(stub.hits["place-5"]), 2)
+        # The first retry has no backoff of its own, so a gap of a second comes from Retry-After
+        first, retry = stub.hits["place-3"]
+        self.assertGreaterEqual(retry - first, 0.9)
+
+    def test_concurrency_stays_within_places_concurrency(self):
+        stub = PlacesStub()
+        self.fetch(stub, concurrency=3)
+        self.assertEqual(stub.max_in_flight, 3)
+
+
+class StaleRefreshBackoffTest(unittest.TestCase):
+    def wait_for_refreshes(self):
+        deadline = time.monotonic() + 10
+        while fetch_restaurant_data._fetches._calls and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_failed_refresh_is_not_retried_within_the_backoff(self):
+        restaurant_cache.write_partition("Staleville", pd.DataFrame({
+            "City": ["Staleville"],
+            "Timestamp": [pd.Timestamp("2000-01-01")],
+            "Restaurant Name": ["Old Bistro"],
+            "Address": ["1 Old St"],
+        }))
+        denied = lambda path, query: (403, {}, {"status": "REQUEST_DENIED"})
+
+        with StubServer(denied) as server, mock.patch.object(fetch_restaurant_data, "GOOGLE_PLACES_BASE_URL", server.url):
+            for _ in range(3):
+                data = fetch_restaurant_data.fetch_and_save_data("Staleville")
+                self.assertEqual(data["Restaurant Name"].tolist(), ["Old Bistro"])
+                self.wait_for_refreshes()
+            self.assertEqual(len(server.paths("/textsearch")), 1)
+
+            with mock.patch.object(fetch_restaurant_data, "RESTAURANT_REFRESH_BACKOFF_SECONDS", 0):
+                fetch_restaurant_data.fetch_and_save_data("Staleville")
+                self.wait_for_refreshes()
+            self.assertEqual(len(server.paths("/textsearch")), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
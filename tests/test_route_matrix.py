@@ -0,0 +1,72 @@
+import os
+import shutil
+import unittest
+from unittest import mock
+import numpy as np
+import logistics_module
+import route_matrix
+from ttl_cache import TTL_CACHE_FOLDER
+from tests.stub_server import StubServer
+
+ORIGIN = logistics_module.LAX_COORDINATES
+ROUTE = {"routes": [{"summary": {"lengthInMeters": 20000, "travelTimeInSeconds": 1500, "trafficDelayInSeconds": 120}}]}
+
+
+def tomtom(status=200, body=ROUTE):
+    return lambda path, query: (status, {}, body)
+
+
+class RouteMatrixTest(unittest.TestCase):
+    def setUp(self):
+        # Legs are TTL-cached in memory and on disk; every test starts cold
+        logistics_module.get_route.cache_clear()
+        shutil.rmtree(os.path.join(TTL_CACHE_FOLDER, logistics_module.get_route.__module__ + ".get_route"), ignore_errors=True)
+
+    def matrix(self, handler, lats, lons, **kwargs):
+        with StubServer(handler) as server, mock.patch.object(logistics_module, "TOMTOM_BASE_URL", server.url):
+            matrix = route_matrix.route_matrix(ORIGIN, lats, lons, **kwargs)
+            route_matrix._queue.join()
+            return matrix, server.paths("/routing/")
+
+    def test_points_out_of_range_are_never_routed(self):
+        # London, Sydney and a missing coordinate
+        matrix, calls = self.matrix(tomtom(), [51.5, -33.9, np.nan], [-0.1, 151.2, -118.0], max_distance_km=300)
+
+        self.assertEqual(calls, [])
+        self.assertEqual(matrix["status"].tolist(), ["out_of_range", "out_of_range", "invalid"])
+        self.assertTrue(matrix["eta_minutes"].isna().all())
+
+    def test_points_in_one_grid_cell_share_one_leg(self):
+        # Ten restaurants within ~30 m of each other round to the same cell
+        lats = 34.0501 + np.linspace(0, 0.0003, 10)
+        lons = np.full(10, -118.2501)
+        matrix, calls = self.matrix(tomtom(), lats, lons)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(matrix["status"].tolist(), ["ok"] * 10)
+        self.assertEqual(matrix["eta_minutes"].tolist(), [25.0] * 10)
+        self.assertEqual(matrix["traffic_delay_seconds"].tolist(), [120.0] * 10)
+
+    def test_routing_errors_become_no_route(self):
+        for handler in (tomtom(400, "<html>Bad Request</html>"), tomtom(200, {"routes": []})):
+            with self.subTest(handler=handler):
+                self.setUp()
+                matrix, calls = self.matrix(handler, [34.05], [-118.25])
+
+                self.assertEqual(len(calls), 1)
+                self.assertEqual(matrix["status"].tolist(), ["no_route"])
+                self.assertTrue(np.isnan(matrix.loc[0, "travel_time_seconds"]))
+
+    def test_cached_only_reports_pending_legs_and_routes_them_in_the_background(self):
+        lats, lons = [34.05, 34.15], [-118.25, -118.35]
+        pending, calls = self.matrix(tomtom(), lats, lons, cached_only=True)
+        self.assertEqual(pending["status"].tolist(), ["pending", "pending"])
+        self.assertEqual(len(calls), 2)
+
+        routed, calls = self.matrix(tomtom(), lats, lons, cached_only=True)
+        self.assertEqual(routed["status"].tolist(), ["ok", "ok"])
+        self.assertEqual(calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import json
+import os
+import unittest
+import ttl_cache
+
+
+def _persisted(name, body):
+    calls = []
+
+    def fetch(city):
+        calls.append(city)
+        return body(city)
+
+    fetch.__qualname__ = name
+    return ttl_cache.ttl_cache(ttl=60, persist=True)(fetch), calls
+
+
+def _files(name):
+    folder = os.path.join(ttl_cache.TTL_CACHE_FOLDER, f"{__name__}.{name}")
+    return [os.path.join(folder, file_name) for file_name in os.listdir(folder)] if os.path.isdir(folder) else []
+
+
+class PersistedTTLCacheTest(unittest.TestCase):
+    def test_entries_are_stored_as_json_and_shared(self):
+        fetch, calls = _persisted("PersistedTTLCacheTest.forecast", lambda city: [{"city": city, "temp": 18.5}])
+        self.assertEqual(fetch("Paris"), [{"city": "Paris", "temp": 18.5}])
+
+        [path] = _files("PersistedTTLCacheTest.forecast")
+        self.assertTrue(path.endswith(".json"))
+        with open(path) as f:
+            self.assertEqual(json.load(f)["value"], [{"city": "Paris", "temp": 18.5}])
+
+        # A fresh cache for the same function (e.g. another worker) reads the file instead of calling
+        fetch.cache_clear()
+        self.assertEqual(fetch("Paris"), [{"city": "Paris", "temp": 18.5}])
+        self.assertEqual(calls, ["Paris"])
+
+    def test_unreadable_files_are_ignored(self):
+        fetch, calls = _persisted("PersistedTTLCacheTest.route", lambda city: [city])
+        fetch("Rome")
+        [path] = _files("PersistedTTLCacheTest.route")
+        for content in (b"\x80\x04K\x01.", b'{"value": ["Rome"]}', b"[]"):
+            with self.subTest(content=content):
+                with open(path, "wb") as f:
+                    f.write(content)
+                fetch.cache_clear()
+                self.assertEqual(fetch("Rome"), ["Rome"])
+        self.assertEqual(len(calls), 4)
+
+    def test_values_that_are_not_json_stay_in_memory(self):
+        fetch, calls = _persisted("PersistedTTLCacheTest.pairs", lambda city: {city, "x"})
+        with self.assertLogs("ttl_cache", "WARNING"):
+            fetch("Oslo")
+        self.assertEqual(fetch("Oslo"), {"Oslo", "x"})
+        self.assertEqual(calls, ["Oslo"])
+        self.assertEqual(_files("PersistedTTLCacheTest.pairs"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
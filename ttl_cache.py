@@ -0,0 +1,170 @@
+import os
+import logging
+import time
+import json
+import hashlib
+import inspect
+import threading
+from collections import OrderedDict
+from functools import wraps
+from atomic_file import atomic_path
+from data_store import DATA_FOLDER
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Persisted entries live here, one JSON file per cached call. JSON rather than pickle, so
+# whoever can write to this folder can feed workers bad data but never run code in them
+TTL_CACHE_FOLDER = os.path.join(DATA_FOLDER, ".cache", "ttl")
+
+# Every decorated function by qualified name, for reporting hit/miss counters
+CACHES = {}
+
+
+class _TTLCache:
+    def __init__(self, func, ttl, maxsize, persist, cache_if):
+        self.func = func
+        self.name = f"{func.__module__}.{func.__qualname__}"
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.persist = persist
+        self.cache_if = cache_if
+        self.signature = inspect.signature(func)
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+        self.flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, args, kwargs):
+        # Bind against the signature so f(a) and f(a, default) share an entry
+        bound = self.signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return repr(tuple(bound.arguments.items()))
+
+    def _path(self, key):
+        digest = hashlib.sha1(f"{self.name}:{key}".encode()).hexdigest()
+        return os.path.join(TTL_CACHE_FOLDER, self.name, digest + ".json")
+
+    def _store(self, key, expires_at, value):
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def _lookup(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            with self.lock:
+                self.entries.pop(key, None)
+            return None
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+        return entry
+
+    def _load(self, key):
+        # Entry written by an earlier run or by another worker
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+            expires_at, value = float(entry["expires_at"]), entry["value"]
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+        if expires_at < time.time():
+            return None
+        self._store(key, expires_at, value)
+        return expires_at, value
+
+    def _save(self, key, expires_at, value):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with atomic_path(path) as tmp_path, open(tmp_path, "w") as f:
+                json.dump({"expires_at": expires_at, "value": value}, f)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("Failed to persist cache entry for %s: %s", self.name, e)
+
+    def call(self, args, kwargs):
+        key = self.key(args, kwargs)
+        entry = self._lookup(key)
+        if entry is None and self.persist:
+            entry = self._load(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+
+        def compute():
+            value = self.func(*args, **kwargs)
+            if self.cache_if is None or self.cache_if(value):
+                expires_at = time.time() + self.ttl
+                self._store(key, expires_at, value)
+                if self.persist:
+                    self._save(key, expires_at, value)
+            return value
+
+        # Another thread or worker may have stored it while we waited
+        return self.flights.do(f"{self.name}:{key}", compute, recheck=lambda: self._live(key))
+
+    def _live(self, key):
+        # The value of a live entry (in memory or persisted), or None
+        entry = self._lookup(key) or (self._load(key) if self.persist else None)
+        return None if entry is None else entry[1]
+
+    def peek(self, args, kwargs):
+        return self._live(self.key(args, kwargs))
+
+    def info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+        }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def ttl_cache(ttl, maxsize=128, persist=False, cache_if=None):
+    """Cache a function's results per argument set for `ttl` seconds.
+
+    At most `maxsize` entries are kept, evicting the least recently used.
+    Concurrent misses for the same arguments are coalesced into one call.
+    With persist=True each entry is also written under data/.cache/ttl, so a
+    restarted worker starts warm and workers share each other's results; the
+    values must then be JSON-serializable (values that aren't stay in memory only).
+    `cache_if(value)` can reject values (e.g. empty responses) from the cache.
+
+    The wrapper exposes cache_info(), cache_clear() and cache_get(*args, **kwargs),
+    which returns a live cached value (or None) without calling the function.
+    """
+    def decorator(func):
+        cache = _TTLCache(func, ttl, maxsize, persist, cache_if)
+        CACHES[cache.name] = cache
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return cache.call(args, kwargs)
+
+        wrapper.cache_info = cache.info
+        wrapper.cache_clear = cache.clear
+        wrapper.cache_get = lambda *args, **kwargs: cache.peek(args, kwargs)
+        return wrapper
+
+    return decorator
+
+
+def cache_stats():
+    """Counters for every TTL-cached function, keyed by qualified name."""
+    return {name: cache.info() for name, cache in CACHES.items()}
@@ -0,0 +1,217 @@
+from bisect import bisect_left
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from data_store import get_derived
+from instrumentation import timed
+
+WINE_IMAGES = {
+    "Red": "https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcSMHCcX8j8urf0uLcbriIjnv5NHoQHwYBU_-g&s",  # Replace with real image URLs
+    "White": "https://www.coravin.com/cdn/shop/articles/types_of_white_wine.jpg?v=1725372804",
+    "Sparkling": "https://ricowines.com/wp-content/uploads/2024/01/white-Sparkling-1.webp",
+    "Rosé": "https://www.realsimple.com/thmb/t8ReENA47WfSPI4Z-VwitNYNWU0=/1500x0/filters:no_upscale():max_bytes(150000):strip_icc()/what-is-rose-GettyImages-1330692681-cf7d3da139524fcbaef63a3ab012821f.jpg",
+    "Dessert": "https://images.squarespace-cdn.com/content/v1/54217456e4b0423f1490b26a/1568582733342-6OBSIK7JFMDTH7T6FEAI/Wine+Pairing-7.jpg?format=1500w"
+}
+DEFAULT_WINE_IMAGE = "https://cdn.cluboenologique.com/wp-content/uploads/2022/03/02113400/vilafonte-675x450.jpg"
+
+# Accepted values for the `sort` parameter; prefix with '-' for descending
+SORT_KEYS = ("name", "price", "score")
+
+
+# Helper function to return a default image URL based on the wine type
+def get_wine_image(wine_type):
+    # Default image if wine type not found
+    return WINE_IMAGES.get(wine_type, DEFAULT_WINE_IMAGE)
+
+
+def _rows_by_code(codes, n_codes):
+    # Group row positions by code: one stable argsort, then slice per code
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(n_codes + 1))
+    return [order[bounds[i]:bounds[i + 1]] for i in range(n_codes)]
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _SortedColumn:
+    """A numeric column with its argsort, so range filters become searchsorted slices."""
+
+    def __init__(self, values):
+        self.values = values
+        self.order = np.argsort(values, kind='stable')
+        self.sorted = values[self.order]
+        # NaNs sort last; keep them out of every range
+        self.valid = int(np.count_nonzero(~np.isnan(values)))
+        # Rank of each row in sorted order, so any subset sorts by integer rank
+        self.rank = np.empty(len(values), dtype=np.intp)
+        self.rank[self.order] = np.arange(len(values))
+
+    def bounds(self, low=None, high=None):
+        lo = int(np.searchsorted(self.sorted[:self.valid], low, side='left')) if low is not None else 0
+        hi = int(np.searchsorted(self.sorted[:self.valid], high, side='right')) if high is not None else self.valid
+        return lo, max(lo, hi)
+
+    def contains(self, positions, low=None, high=None):
+        values = self.values[positions]
+        mask = ~np.isnan(values)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        return mask
+
+
+class WineCatalog:
+    """Query layer over the wine catalog, built once per version of wine_restaurants.csv.
+
+    Each filter resolves to a candidate set of row positions through an index
+    (category codes, supplier token index, sorted numeric columns). Only the
+    smallest candidate set is materialized; the remaining filters are checked
+    against those rows alone, so a selective query never scans the catalog.
+    """
+
+    def __init__(self, frame):
+        if frame.empty:
+            frame = pd.DataFrame(columns=['Wine Name', 'Wine Type', 'Wine Price', 'Company Name', 'Location', 'Tasting Score'])
+        self.frame = frame.reset_index(drop=True)
+
+        # Wine type: categorical codes and the rows for each code
+        types = self.frame['Wine Type'].astype('category')
+        self._type_codes = types.cat.codes.to_numpy()
+        self._type_names = [str(name) for name in types.cat.categories]
+        self._type_lower = [name.lower() for name in self._type_names]
+        self._rows_by_type = _rows_by_code(self._type_codes, len(self._type_names))
+
+        # Image URLs mapped per category once, then broadcast to every row
+        images_by_code = np.array([get_wine_image(name) for name in self._type_names] + [DEFAULT_WINE_IMAGE], dtype=object)
+        self._images = images_by_code[self._type_codes]
+
+        # Suppliers: lowercase-normalized names, exact/prefix lookups and a trigram index for substrings
+        suppliers = self.frame['Company Name'].astype(object).str.strip().str.lower()
+        codes, names = pd.factorize(suppliers)
+        self._supplier_codes = np.asarray(codes)
+        self._supplier_names = [str(name) for name in names]
+        self._supplier_exact = {name: code for code, name in enumerate(self._supplier_names)}
+        self._supplier_sorted = sorted(self._supplier_exact)
+        self._supplier_trigrams = defaultdict(set)
+        for code, name in enumerate(self._supplier_names):
+            for gram in _trigrams(name):
+                self._supplier_trigrams[gram].add(code)
+        self._rows_by_supplier = _rows_by_code(self._supplier_codes, len(self._supplier_names))
+
+        # Numeric columns sorted once for range filters
+        self._price = _SortedColumn(self.frame['Wine Price'].to_numpy(dtype='float64'))
+        self._score = _SortedColumn(self.frame['Tasting Score'].to_numpy(dtype='float64'))
+        name_order = np.argsort(self.frame['Wine Name'].astype(str).str.lower().to_numpy(), kind='stable')
+        self._name_rank = np.empty(len(self.frame), dtype=np.intp)
+        self._name_rank[name_order] = np.arange(len(self.frame))
+        self._ranks = {"name": self._name_rank, "price": self._price.rank, "score": self._score.rank}
+
+    def __len__(self):
+        return len(self.frame)
+
+    def type_codes(self, query):
+        """Category codes whose wine type contains the query (case-insensitive)."""
+        query = query.strip().lower()
+        return [code for code, name in enumerate(self._type_lower) if query in name]
+
+    def supplier_codes(self, query, match='contains'):
+        """Supplier codes matching the query: 'exact', 'prefix' or 'contains' (case-insensitive).
+
+        A blank query matches nothing; filter() treats it as no supplier filter.
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+        if match == 'exact':
+            code = self._supplier_exact.get(query)
+            return [] if code is None else [code]
+        if match == 'prefix':
+            codes = []
+            i = bisect_left(self._supplier_sorted, query)
+            while i < len(self._supplier_sorted) and self._supplier_sorted[i].startswith(query):
+                codes.append(self._supplier_exact[self._supplier_sorted[i]])
+                i += 1
+            return codes
+
+        if len(query) < 3:
+            candidates = range(len(self._supplier_names))
+        else:
+            # Every supplier containing the query contains all of its trigrams
+            postings = sorted((self._supplier_trigrams.get(gram, set()) for gram in _trigrams(query)), key=len)
+            candidates = set.intersection(*postings) if postings else set()
+        return sorted(code for code in candidates if query in self._supplier_names[code])
+
+    @timed("wine_filter")
+    def filter(self, wine_type=None, supplier=None, min_price=None, max_price=None,
+               min_score=None, max_score=None, supplier_match='contains'):
+        """Return the row positions (in catalog order) matching every given filter.
+
+        A wine type or supplier that is blank after stripping is no filter at all.
+        """
+        wine_type = wine_type.strip() if wine_type else None
+        supplier = supplier.strip() if supplier else None
+        # Each filter: (estimated size, materialize(), check(positions) -> mask)
+        filters = []
+
+        if wine_type:
+            codes = np.array(self.type_codes(wine_type), dtype=self._type_codes.dtype)
+            filters.append((
+                sum(len(self._rows_by_type[c]) for c in codes),
+                lambda codes=codes: np.concatenate([self._rows_by_type[c] for c in codes]) if len(codes) else np.array([], dtype=np.intp),
+                lambda positions, codes=codes: np.isin(self._type_codes[positions], codes),
+            ))
+        if supplier:
+            codes = np.array(self.supplier_codes(supplier, match=supplier_match), dtype=np.intp)
+            filters.append((
+                sum(len(self._rows_by_supplier[c]) for c in codes),
+                lambda codes=codes: np.concatenate([self._rows_by_supplier[c] for c in codes]) if len(codes) else np.array([], dtype=np.intp),
+                lambda positions, codes=codes: np.isin(self._supplier_codes[positions], codes),
+            ))
+        for column, low, high in ((self._price, min_price, max_price), (self._score, min_score, max_score)):
+            if low is None and high is None:
+                continue
+            lo, hi = column.bounds(low, high)
+            filters.append((
+                hi - lo,
+                lambda column=column, lo=lo, hi=hi: column.order[lo:hi],
+                lambda positions, column=column, low=low, high=high: column.contains(positions, low, high),
+            ))
+
+        if not filters:
+            return np.arange(len(self.frame))
+
+        filters.sort(key=lambda f: f[0])
+        positions = filters[0][1]()
+        for _, _, check in filters[1:]:
+            if not len(positions):
+                break
+            positions = positions[check(positions)]
+        return np.sort(positions)
+
+    @timed("wine_page")
+    def page(self, positions, page=1, page_size=50, sort=None):
+        """Sort the matched positions and return the requested page of them.
+
+        Sorting works on precomputed integer ranks, so it only touches the
+        matched rows; with no sort the page is a plain slice in catalog order.
+        """
+        key = (sort or "").lstrip('-')
+        if key in self._ranks:
+            ranks = self._ranks[key][positions]
+            order = np.argsort(-ranks if sort.startswith('-') else ranks, kind='stable')
+            positions = positions[order]
+        start = (max(page, 1) - 1) * page_size
+        return positions[start:start + page_size]
+
+    def records(self, positions):
+        """Rows at the given positions, with their image URL attached."""
+        rows = self.frame.iloc[positions]
+        return rows.assign(**{'Wine Image': self._images[positions]})
+
+
+def get_wine_catalog():
+    """Return the catalog for the current version of the wine dataset."""
+    return get_derived("wines", WineCatalog)
@@ -0,0 +1,268 @@
+import os
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from data_store import get_dataset
+from instrumentation import timed
+from route_matrix import EARTH_RADIUS_KM
+import restaurant_cache
+
+logger = logging.getLogger(__name__)
+
+# Edge of a grid cell in the supplier index, in km. Smaller cells prune more per
+# query but need more rings to reach suppliers far away
+MATCH_GRID_KM = float(os.getenv('MATCH_GRID_KM', 250))
+# Suppliers returned per restaurant unless the caller asks for another number
+DEFAULT_MATCHES = 5
+MAX_MATCHES = 50
+# Queries compared against their candidates at once, which bounds the distance matrix
+MATCH_CHUNK_ROWS = 4096
+
+MATCH_COLUMNS = [
+    "restaurant", "rank", "Company Name", "Location", "Region", "Country",
+    "distance_km", "matching_wines", "min_price", "max_price",
+]
+
+
+def unit_vectors(lats, lons):
+    """(lat, lon) in degrees as 3D points on the unit sphere, one row per point."""
+    lat = np.radians(np.asarray(lats, dtype='float64'))
+    lon = np.radians(np.asarray(lons, dtype='float64'))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def chord_to_km(chord):
+    """Great-circle distance in km for a straight-line (chord) distance on the unit sphere."""
+    chord = np.asarray(chord, dtype='float64')
+    with np.errstate(invalid='ignore'):
+        km = 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+    return np.where(np.isinf(chord), np.inf, km)
+
+
+def km_to_chord(km):
+    return 2 * np.sin(min(km / (2 * EARTH_RADIUS_KM), np.pi / 2))
+
+
+class GridIndex:
+    """Points on the globe, bucketed into cubic cells over their unit-sphere coordinates.
+
+    Working in 3D keeps the bound exact everywhere, poles and the date line
+    included: a point whose cell is r cells away (largest per-axis offset)
+    from a query's cell is at least r - 1 cell edges away from the query.
+    A k-nearest search therefore visits occupied cells ring by ring and stops
+    once the kth candidate is closer than anything in the next ring.
+    """
+
+    def __init__(self, lats, lons, cell_km=None):
+        self.points = unit_vectors(lats, lons)
+        self.edge = km_to_chord(cell_km or MATCH_GRID_KM)
+        located = np.isfinite(self.points).all(axis=1)
+        self.positions = np.flatnonzero(located)
+        cells = np.floor(self.points[located] / self.edge).astype(np.int64)
+        self.cells, inverse = np.unique(cells.reshape(-1, 3), axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        # Point positions grouped by cell: one stable argsort, then a slice per cell
+        order = np.argsort(inverse, kind='stable')
+        self._cell_points = self.positions[order]
+        self._cell_bounds = np.searchsorted(inverse[order], np.arange(len(self.cells) + 1))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _candidates(self, cell, k, mask, max_chord):
+        # Eligible points in the occupied cells nearest to `cell`, ring by ring, until no
+        # unvisited ring can hold a point closer than the kth candidate (seen from the cell's centre)
+        rings = np.abs(self.cells - cell).max(axis=1)
+        cell_order = np.argsort(rings, kind='stable')
+        ring_values, ring_starts = np.unique(rings[cell_order], return_index=True)
+        ring_ends = np.append(ring_starts[1:], len(cell_order))
+        centre = (cell + 0.5) * self.edge
+        # Any query in the cell is within half a cell diagonal of its centre
+        slack = np.sqrt(3) / 2 * self.edge
+
+        parts = []
+        for i in range(len(ring_values)):
+            for c in cell_order[ring_starts[i]:ring_ends[i]]:
+                points = self._cell_points[self._cell_bounds[c]:self._cell_bounds[c + 1]]
+                parts.append(points[mask[points]] if mask is not None else points)
+            if i + 1 == len(ring_values):
+                break
+            reach = (ring_values[i + 1] - 1) * self.edge
+            if reach > max_chord:
+                break
+            candidates = np.concatenate(parts)
+            if len(candidates) >= k:
+                distances = np.linalg.norm(self.points[candidates] - centre, axis=1)
+                if np.partition(distances, k - 1)[k - 1] + slack <= reach:
+                    break
+        return np.concatenate(parts) if parts else np.array([], dtype=np.intp)
+
+    def nearest(self, lats, lons, k, mask=None, max_distance_km=None):
+        """Positions and distances (km) of the k nearest points to each query, nearest first.
+
+        Only points where `mask` is True are considered. Slots without a point
+        (too few eligible points, beyond max_distance_km or a query without
+        coordinates) hold position -1 and distance inf.
+        """
+        queries = unit_vectors(lats, lons)
+        indices = np.full((len(queries), k), -1, dtype=np.intp)
+        chords = np.full((len(queries), k), np.inf)
+        valid = np.flatnonzero(np.isfinite(queries).all(axis=1))
+        if k <= 0 or not len(valid) or not len(self):
+            return indices, chord_to_km(chords)
+        max_chord = km_to_chord(max_distance_km) if max_distance_km is not None else np.inf
+
+        # Queries are batched per grid cell, so each batch shares one candidate set
+        query_cells = np.floor(queries[valid] / self.edge).astype(np.int64)
+        groups, group_of = np.unique(query_cells, axis=0, return_inverse=True)
+        group_of = group_of.ravel()
+        order = np.argsort(group_of, kind='stable')
+        bounds = np.searchsorted(group_of[order], np.arange(len(groups) + 1))
+
+        for g, cell in enumerate(groups):
+            candidates = self._candidates(cell, k, mask, max_chord)
+            if not len(candidates):
+                continue
+            members = valid[order[bounds[g]:bounds[g + 1]]]
+            points = self.points[candidates]
+            take = min(k, len(candidates))
+            for start in range(0, len(members), MATCH_CHUNK_ROWS):
+                rows = members[start:start + MATCH_CHUNK_ROWS]
+                # |q - p|^2 = 2 - 2 q.p on the unit sphere
+                distances = np.sqrt(np.clip(2 - 2 * queries[rows] @ points.T, 0, None))
+                nearest = np.argpartition(distances, take - 1, axis=1)[:, :take] if take < len(candidates) else np.tile(np.arange(take), (len(rows), 1))
+                nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+                ranked = np.argsort(nearest_distances, axis=1, kind='stable')
+                nearest = np.take_along_axis(nearest, ranked, axis=1)
+                nearest_distances = np.take_along_axis(nearest_distances, ranked, axis=1)
+                beyond = nearest_distances > max_chord
+                indices[rows, :take] = np.where(beyond, -1, candidates[nearest])
+                chords[rows, :take] = np.where(beyond, np.inf, nearest_distances)
+        return indices, chord_to_km(chords)
+
+
+class SupplierMatcher:
+    """Catalog suppliers (a company at its wine region), located and indexed for nearest-N queries.
+
+    Wine rows are kept sorted by supplier then price, so the wines matching a
+    type and price band reduce to per-supplier counts and price ranges with
+    one vectorized pass, whatever the number of restaurants queried.
+    """
+
+    def __init__(self, wines, regions):
+        # Wines without a company can't be sourced from anyone
+        wines = wines[wines['Company Name'].notna() & wines['Location'].notna()]
+        keys = wines[['Company Name', 'Location']].astype(str)
+        supplier_codes, suppliers = pd.MultiIndex.from_frame(keys).factorize()
+        self.suppliers = suppliers.to_frame(index=False, name=['Company Name', 'Location'])
+
+        coordinates = regions.drop_duplicates('Location').set_index('Location')
+        located = self.suppliers.join(coordinates[['Region', 'Country', 'Latitude', 'Longitude']], on='Location')
+        self.suppliers = located.reset_index(drop=True)
+        missing = self.suppliers.loc[self.suppliers['Latitude'].isna(), 'Location'].unique()
+        if len(missing):
+            logger.warning("No coordinates for supplier regions: %s", ", ".join(missing))
+        self.index = GridIndex(self.suppliers['Latitude'], self.suppliers['Longitude'])
+
+        prices = wines['Wine Price'].to_numpy(dtype='float64')
+        order = np.lexsort((prices, supplier_codes))
+        self._supplier = supplier_codes[order]
+        self._price = prices[order]
+        type_codes, self._type_names = pd.factorize(wines['Wine Type'].astype(str))
+        self._type = type_codes[order]
+        self._type_lower = [name.lower() for name in self._type_names]
+
+    def __len__(self):
+        return len(self.suppliers)
+
+    def type_codes(self, query):
+        """Codes of the wine types containing the query (case-insensitive), as on /wines."""
+        query = query.strip().lower()
+        return [code for code, name in enumerate(self._type_lower) if query in name]
+
+    def carrying(self, wine_type=None, min_price=None, max_price=None):
+        """Per supplier: number of matching wines and their lowest and highest price."""
+        rows = np.ones(len(self._supplier), dtype=bool)
+        if wine_type:
+            rows &= np.isin(self._type, self.type_codes(wine_type))
+        if min_price is not None:
+            rows &= self._price >= min_price
+        if max_price is not None:
+            rows &= self._price <= max_price
+
+        suppliers, prices = self._supplier[rows], self._price[rows]
+        counts = np.bincount(suppliers, minlength=len(self))
+        lowest = np.full(len(self), np.nan)
+        highest = np.full(len(self), np.nan)
+        # Rows are sorted by (supplier, price): a run's first price is its minimum, its last the maximum
+        codes, first, run_lengths = np.unique(suppliers, return_index=True, return_counts=True)
+        lowest[codes] = prices[first]
+        highest[codes] = prices[first + run_lengths - 1]
+        return counts, lowest, highest
+
+    @timed("supplier_match")
+    def match(self, lats, lons, n=DEFAULT_MATCHES, wine_type=None, min_price=None, max_price=None, max_distance_km=None):
+        """The n nearest suppliers carrying the requested wines, for every (lat, lon) at once.
+
+        Returns one row per (restaurant, supplier) pair with the restaurant's
+        position in the input, the supplier's rank (1 = nearest) and distance,
+        and how many matching wines it lists in which price range.
+        """
+        counts, lowest, highest = self.carrying(wine_type, min_price, max_price)
+        indices, distances = self.index.nearest(lats, lons, n, mask=counts > 0, max_distance_km=max_distance_km)
+
+        restaurant, slot = np.nonzero(indices >= 0)
+        supplier = indices[restaurant, slot]
+        matches = self.suppliers.iloc[supplier][["Company Name", "Location", "Region", "Country"]].reset_index(drop=True)
+        matches.insert(0, "restaurant", restaurant)
+        matches.insert(1, "rank", slot + 1)
+        matches["distance_km"] = distances[restaurant, slot].round(1)
+        matches["matching_wines"] = counts[supplier]
+        matches["min_price"] = lowest[supplier]
+        matches["max_price"] = highest[supplier]
+        return matches[MATCH_COLUMNS]
+
+
+_matcher = {"frames": None, "value": None}
+_matcher_lock = threading.Lock()
+
+
+def _is_current(frames):
+    built_from = _matcher["frames"]
+    return built_from is not None and all(old is new for old, new in zip(built_from, frames))
+
+
+def get_supplier_matcher():
+    """Return the matcher for the current versions of the wine catalog and the region coordinates."""
+    # Rebuilt when either dataset is reloaded, like data_store.get_derived but over two datasets
+    frames = (get_dataset("wines"), get_dataset("supplier_regions"))
+    if _is_current(frames):
+        return _matcher["value"]
+
+    with _matcher_lock:
+        if _is_current(frames):
+            return _matcher["value"]
+        wines, regions = frames
+        if wines.empty or regions.empty:
+            value = None
+        else:
+            value = SupplierMatcher(wines, regions)
+        _matcher.update(frames=frames, value=value)
+        return value
+
+
+def match_city(city, n=DEFAULT_MATCHES, wine_type=None, min_price=None, max_price=None, max_distance_km=None):
+    """Nearest suppliers for every cached restaurant in a city, with the restaurant's name and address."""
+    restaurants = restaurant_cache.read_partition(city)
+    matcher = get_supplier_matcher()
+    if matcher is None or restaurants.empty or not {"Latitude", "Longitude"} <= set(restaurants.columns):
+        return pd.DataFrame(columns=["Restaurant Name", "Address"] + MATCH_COLUMNS)
+
+    matches = matcher.match(
+        pd.to_numeric(restaurants["Latitude"], errors='coerce'),
+        pd.to_numeric(restaurants["Longitude"], errors='coerce'),
+        n=n, wine_type=wine_type, min_price=min_price, max_price=max_price, max_distance_km=max_distance_km
+    )
+    details = restaurants.iloc[matches["restaurant"].to_numpy()][["Restaurant Name", "Address"]].reset_index(drop=True)
+    return pd.concat([details, matches], axis=1)